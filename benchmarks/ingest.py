@@ -0,0 +1,96 @@
+#!usr/bin/env python3
+# benchmarks/ingest.py - load tests YouTubeAPI.get_video_data()
+#                      - against the local stand-in API with set latency
+#                      - records throughput and tail latency of fetches
+#
+# by Shivan Sivakumaran
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import googleapiclient.errors
+import numpy as np
+
+from tubestats.api import YouTubeAPI
+from tubestats.fake_server import FakeYouTubeAPI, base_url, serve
+
+
+def run(
+    api: FakeYouTubeAPI, channel_IDs: List[str], repeat: int, workers: int
+) -> Dict:
+    """Fetches every channel repeat times, timing each fetch."""
+    seconds, videos, failures = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for channel_ID in channel_IDs:
+            start = time.perf_counter()
+            try:
+                df = YouTubeAPI(channel_ID, workers=workers).get_video_data()
+            except googleapiclient.errors.HttpError:
+                failures += 1
+                continue
+            seconds.append(time.perf_counter() - start)
+            videos += len(df)
+    elapsed = time.perf_counter() - started
+
+    latencies = {}
+    if seconds:
+        for q in (50, 95, 99):
+            latencies[f"p{q}"] = float(np.percentile(seconds, q))
+        latencies["max"] = max(seconds)
+    return dict(
+        fetches=len(seconds),
+        failures=failures,
+        videos_per_second=videos / elapsed,
+        seconds=latencies,
+        requests=dict(api.requests),
+        errors={str(status): n for status, n in api.errors.items()},
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Load test fetching videos from a stand-in API"
+    )
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    api = FakeYouTubeAPI(
+        latency=args.latency,
+        jitter=args.jitter,
+        quota_error_rate=args.quota_error_rate,
+        server_error_rate=args.server_error_rate,
+        seed=args.seed,
+    )
+    channel_IDs = api.add_synthetic(args.channels, args.videos)
+    server = serve(api)
+    os.environ["YT_API_BASE_URL"] = base_url(server)
+    try:
+        results = run(api, channel_IDs, args.repeat, args.workers)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!usr/bin/env python3
+# benchmarks/run.py - times YouTubeData over synthetic channels
+#                   - records time and peak memory per function and size
+#                   - fails when results regress against a saved baseline
+#
+# by Shivan Sivakumaran
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from tubestats.api import parse_channel_response
+from tubestats.data import YouTubeData
+from tubestats.schema import extract_video_columns
+from tubestats.synthetic import synthetic_channel
+
+SIZES = [100, 1000, 10000, 100000]
+
+
+@lru_cache(maxsize=None)
+def synthetic_data(n: int) -> Tuple[str, Dict, pd.core.frame.DataFrame]:
+    """Channel ID, channel data and video data of a synthetic channel."""
+    channel, videos = synthetic_channel(n)
+    channel_data = parse_channel_response({"items": [channel]})
+    return (
+        channel["id"],
+        channel_data,
+        pd.DataFrame(extract_video_columns(videos)),
+    )
+
+
+def make_youtubedata(n: int) -> YouTubeData:
+    """New YouTubeData of a synthetic channel with n videos."""
+    channel_ID, channel_data, df = synthetic_data(n)
+    return YouTubeData(channel_ID, channel_data=channel_data, df=df)
+
+
+def cases(n: int) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """Functions to benchmark, each set up fresh so memoizing is not timed."""
+
+    def dataframe():
+        # video data is cleaned when assigned
+        channel_ID, channel_data, df = synthetic_data(n)
+        return lambda: YouTubeData(
+            channel_ID, channel_data=channel_data, df=df
+        ).dataframe()
+
+    def with_dataframe(method, *args):
+        def setup():
+            yd = make_youtubedata(n)
+            df = yd.dataframe()
+            if method in (
+                "list_time_difference_ranked",
+                "time_difference_plot",
+            ):
+                df = yd.time_difference_calculate(df)
+            return lambda: getattr(yd, method)(df, *args)
+
+        return setup
+
+    def transform_dataframe():
+        yd = make_youtubedata(n)
+        df = yd.dataframe()
+        dates = df["snippet.publishedAt_REFORMATED"]
+        start = dates.quantile(0.25).to_pydatetime()
+        end = dates.quantile(0.75).to_pydatetime()
+        return lambda: yd.transform_dataframe(start, end)
+
+    def top_videos():
+        yd = make_youtubedata(n)
+        dates = yd.dataframe()["snippet.publishedAt_REFORMATED"]
+        start = dates.quantile(0.25).to_pydatetime()
+        end = dates.quantile(0.75).to_pydatetime()
+        # ranking once per channel, then timing a query over a window
+        yd.top_videos()
+        return lambda: yd.top_videos(date_start=start, date_end=end)
+
+    def chart(method):
+        def setup():
+            yd = make_youtubedata(n)
+            df = yd.time_difference_calculate(yd.dataframe())
+            # serialising to Vega-Lite is the cost paid by the browser
+            return lambda: getattr(yd, method)(df).to_dict()
+
+        return setup
+
+    return {
+        "dataframe": dataframe,
+        "transform_dataframe": transform_dataframe,
+        "time_difference_calculate": with_dataframe(
+            "time_difference_calculate"
+        ),
+        "most_viewed_videos": with_dataframe("most_viewed_videos"),
+        "list_time_difference_ranked": with_dataframe(
+            "list_time_difference_ranked"
+        ),
+        "top_videos": top_videos,
+        "scatter_all_videos": chart("scatter_all_videos"),
+        "time_difference_plot": chart("time_difference_plot"),
+    }
+
+
+def measure(setup: Callable[[], Callable[[], object]], repeat: int) -> Dict:
+    """Best time of repeat runs, and peak memory of one traced run."""
+    times = []
+    for _ in range(repeat):
+        func = setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    func = setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(seconds=min(times), peak_bytes=peak)
+
+
+def run(sizes: List[int], repeat: int, only: List[str]) -> Dict:
+    results: Dict[str, Dict] = {}
+    for n in sizes:
+        for name, setup in cases(n).items():
+            if only and name not in only:
+                continue
+            try:
+                result = measure(setup, repeat)
+            except Exception as e:
+                # e.g. charts past Altair's row limit, recorded so a fix
+                # shows up against the baseline
+                tracemalloc.stop()
+                result = dict(error=f"{type(e).__name__}: {e}")
+                sys.stderr.write(f"{name:30} {n:>7} {result['error']}\n")
+            else:
+                sys.stderr.write(
+                    f"{name:30} {n:>7} {result['seconds'] * 1000:10.2f} ms "
+                    f"{result['peak_bytes'] / 2**20:8.2f} MiB\n"
+                )
+            results.setdefault(name, {})[str(n)] = result
+    return results
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Results slower or larger than baseline by more than tolerance."""
+    found = []
+    for name, by_size in results.items():
+        for n, result in by_size.items():
+            base = baseline.get(name, {}).get(n)
+            if base is None or "error" in base:
+                continue
+            if "error" in result:
+                found.append(f"{name} n={n}: {result['error']}")
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                if result[metric] > base[metric] * (1 + tolerance):
+                    found.append(
+                        f"{name} n={n} {metric}: "
+                        f"{result[metric]:.4g} > {base[metric]:.4g}"
+                    )
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark YouTubeData over synthetic channels"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only", nargs="+", default=[], help="benchmarks to run"
+    )
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against saved results")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown or growth over the baseline, 0.5 is 50%%",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                dict(created=datetime.now().isoformat(), results=results),
+                f,
+                indent=2,
+            )
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.tolerance)
+        for regression in found:
+            sys.stderr.write(f"REGRESSION {regression}\n")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+#!usr/bin/env python3
+# tubestats/__main__.py - batch analysis of channels, see tubestats/batch.py
+#
+# by Shivan Sivakumaran
+
+import sys
+
+from tubestats.batch import main
+
+if __name__ == "__main__":
+    sys.exit(main())
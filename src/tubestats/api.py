@@ -6,34 +6,136 @@
 #
 # by Shivan Sivakumaran
 
+import functools
 import os
 import logging
-from typing import Dict
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
 import googleapiclient.discovery
 import googleapiclient.errors
 
-from parser import channel_parser
+from tubestats.cache import ResponseCache
+from tubestats.metrics import METRICS
+from tubestats.parser import channel_parser
+from tubestats.pool import HTTP_POOL, HttpPool
+from tubestats.quota import (
+    QUOTA_COSTS,
+    QuotaScheduler,
+    Reservation,
+    channel_cost,
+)
+from tubestats.schema import (
+    extract_video_columns,
+    new_video_buffers,
+    prune_video_data,
+    request_fields,
+)
 
 
-def create_api() -> googleapiclient.discovery.Resource:
+def create_api(
+    base_url: Optional[str] = None,
+) -> googleapiclient.discovery.Resource:
     """
-    Creates an authenticated api client
+    Returns an authenticated api client, built once per base URL and key
+    and shared by the process. Requests are executed with HTTP_POOL, see
+    tubestats.pool.
 
-    :params: None
+    :params:
+        base_url (str, optional): root of the API e.g. a local stand-in
+            server 'http://localhost:8080/', defaults to the
+            YT_API_BASE_URL environment variable then the real API
     :return: authenticated api client
     :rtype: googleapiclient.discovery.Resource
     """
-    api_service_name = "youtube"
-    api_version = "v3"
+    base_url = base_url or os.getenv("YT_API_BASE_URL")
+    developer_key = os.getenv("YT_API_KEY")
+    if base_url:
+        # stand-in servers ignore the key, but without one the client
+        # looks for Google credentials
+        developer_key = developer_key or "local"
+    return _build_api(base_url, developer_key)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_api(
+    base_url: Optional[str], developer_key: Optional[str]
+) -> googleapiclient.discovery.Resource:
+    """Builds a client from the discovery document bundled with
+    googleapiclient, so no request is made"""
+    client_options = {"api_endpoint": base_url} if base_url else None
     try:
-        youtube = googleapiclient.discovery.build(
-            api_service_name, api_version, developerKey=os.getenv("YT_API_KEY")
+        return googleapiclient.discovery.build(
+            "youtube",
+            "v3",
+            developerKey=developer_key,
+            client_options=client_options,
+            static_discovery=True,
         )
     except Exception:
         logging.error("Error on creating API", exc_info=True)
-    return youtube
+        raise
+
+
+def parse_channel_response(channel_res: Dict) -> Dict[str, str]:
+    """
+    Picks channel metadata out of a channels().list response
+
+    :params:
+        channel_res (dict): response for a single channel
+    :return: channel metadata, see YouTubeAPI.get_channel_data()
+    :rtype: dict
+    """
+    channel_details = channel_res["items"][0]
+    channel_statistics = channel_details["statistics"]
+    channel_snippet = channel_details["snippet"]
+
+    channel_data = dict(
+        upload_playlist_ID=channel_details["contentDetails"]["relatedPlaylists"][
+            "uploads"
+        ],
+        channel_name=channel_snippet["title"],
+        channel_subscriber_count=channel_statistics["subscriberCount"],
+        channel_video_count=channel_statistics["videoCount"],
+        channel_start_date=channel_snippet["publishedAt"],
+        channel_thumbnail_url=channel_snippet["thumbnails"]["high"]["url"],
+        channel_description=channel_snippet["description"],
+    )
+    return channel_data
+
+
+def parse_playlist_response(
+    playlist_response: Dict, known_IDs: Set[str]
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Picks video IDs and the next page token out of a playlistItems().list
+    response. Videos from the first known video onwards are dropped and
+    paging ends there, as the uploads playlist is newest first.
+
+    :params:
+        playlist_response (dict): response for a page of the playlist
+        known_IDs (set): IDs of videos already fetched
+    :return: video IDs and the next page token, None on the last page
+    :rtype: Tuple[List[str], Optional[str]]
+    """
+    # isolating video ID
+    vid_subset = [
+        vid_ID["contentDetails"]["videoId"]
+        for vid_ID in playlist_response["items"]
+    ]
+    # obtaining page token
+    next_page_token = playlist_response.get(
+        "nextPageToken"
+    )  # get method used because token may not exist
+    # keeping videos newer than the first known video
+    for i, vid_ID in enumerate(vid_subset):
+        if vid_ID in known_IDs:
+            return vid_subset[:i], None
+    return vid_subset, next_page_token
 
 
 class YouTubeAPI:
@@ -42,23 +144,202 @@ class YouTubeAPI:
 
     :params:
         user_input (str)
+        cache (ResponseCache, optional): stores responses between requests
+        workers (int): threads requesting video statistics while the
+            uploads playlist is paged
+        scheduler (QuotaScheduler, optional): accounts for quota used
+        refresh_within (float): seconds, cached responses that expire
+            sooner are requested again, see ResponseCache.fetch()
+        pool (HttpPool, optional): HTTP clients, defaults to HTTP_POOL
+            shared by the process
     :methods:
         get_channel_data(): returns channel data
         get_video_data(): gets videos data
     """
 
-    def __init__(self, user_input: str):
+    def __init__(
+        self,
+        user_input: str,
+        cache: Optional[ResponseCache] = None,
+        workers: int = 4,
+        scheduler: Optional[QuotaScheduler] = None,
+        refresh_within: float = 0,
+        pool: Optional[HttpPool] = None,
+    ):
         self.youtube = create_api()
         self.user_input = user_input
-        self.channel_ID = channel_parser(self.youtube, self.user_input)
+        self.cache = cache
+        self.workers = workers
+        self.scheduler = scheduler
+        self.refresh_within = refresh_within
+        # quota units used by requests, cache hits are free
+        self.units_used = 0
+        self._units_lock = threading.Lock()
+        self.pool = HTTP_POOL if pool is None else pool
+        with METRICS.stage("resolve_channel"):
+            self.channel_ID = channel_parser(
+                self.youtube,
+                self.user_input,
+                scheduler=scheduler,
+                cache=cache,
+                pool=self.pool,
+            )
+
+    def _call(
+        self,
+        endpoint: str,
+        reservation: Optional[Reservation] = None,
+        **params,
+    ) -> Dict:
+        """
+        Executes a list() request on an endpoint, without the cache
+
+        :params:
+            endpoint (str): 'channels', 'playlistItems' or 'videos'
+            reservation (Reservation, optional): quota of the fetch the
+                request belongs to
+            **params: passed to the endpoint's list()
+        :return: response
+        :rtype: dict
+        """
+        costs = QUOTA_COSTS
+        if self.scheduler is not None:
+            self.scheduler.acquire(endpoint, reservation=reservation)
+            costs = self.scheduler.costs
+            with self._units_lock:
+                self.units_used += costs.get(endpoint, 1)
+        METRICS.inc("tubestats_api_calls_total", endpoint=endpoint)
+        METRICS.inc(
+            "tubestats_quota_units_total",
+            costs.get(endpoint, 1),
+            endpoint=endpoint,
+        )
+        start = time.perf_counter()
+        try:
+            return self.pool.execute(
+                getattr(self.youtube, endpoint)().list(**params)
+            )
+        finally:
+            METRICS.observe(
+                "tubestats_api_request_seconds",
+                time.perf_counter() - start,
+                endpoint=endpoint,
+            )
+
+    def _request(
+        self,
+        endpoint: str,
+        refresh: bool = False,
+        reservation: Optional[Reservation] = None,
+        **params,
+    ) -> Dict:
+        """
+        Executes a list() request on an endpoint, going through the cache if set
+
+        :params:
+            endpoint (str): 'channels' or 'videos'
+            refresh (bool): skip the cache lookup and store a new response
+            reservation (Reservation, optional): quota of the fetch the
+                request belongs to
+            **params: passed to the endpoint's list()
+        :return: response
+        :rtype: dict
+        """
+
+        def request() -> Dict:
+            return self._call(endpoint, reservation=reservation, **params)
+
+        if self.cache is None:
+            return request()
+        return self.cache.fetch(
+            endpoint,
+            params,
+            request,
+            refresh=refresh,
+            refresh_within=self.refresh_within,
+        )
+
+    def _playlist_pages(
+        self,
+        upload_playlist_ID: str,
+        known_IDs: Set[str],
+        reservation: Optional[Reservation] = None,
+    ) -> Iterator[List[str]]:
+        """
+        Requests the uploads playlist a page at a time, each page needs the
+        token of the last
+
+        :params:
+            upload_playlist_ID (str)
+            known_IDs (set): paging stops at the first of these
+            reservation (Reservation, optional): quota of the fetch
+        :return: video IDs of each page, newest first
+        :rtype: Iterator[List[str]]
+        """
+        next_page_token = None
+        while True:
+            playlist_response = self._call(
+                "playlistItems",
+                reservation=reservation,
+                part="contentDetails",
+                maxResults=50,  # API Limit is 50
+                pageToken=next_page_token,
+                playlistId=upload_playlist_ID,
+                fields=request_fields("playlist"),
+            )
+            METRICS.inc("tubestats_pages_total")
+            vid_subset, next_page_token = parse_playlist_response(
+                playlist_response, known_IDs
+            )
+            yield vid_subset
+            if next_page_token is None:
+                return
 
-    def get_channel_data(self) -> Dict[str, str]:
+    def _upload_pages(
+        self,
+        upload_playlist_ID: str,
+        known_IDs: Set[str],
+        reservation: Optional[Reservation] = None,
+    ) -> Iterator[List[str]]:
+        """
+        Video IDs of the uploads playlist a page at a time. A walk of the
+        whole playlist is cached as one entry, as page tokens are offsets:
+        pages stored at different times would repeat or skip the videos
+        uploaded in between. Walks stopping at known videos are not cached.
+
+        :params:
+            upload_playlist_ID (str)
+            known_IDs (set): paging stops at the first of these
+            reservation (Reservation, optional): quota of the fetch
+        :return: video IDs of each page, newest first
+        :rtype: Iterator[List[str]]
+        """
+        if self.cache is None or known_IDs:
+            yield from self._playlist_pages(
+                upload_playlist_ID, known_IDs, reservation
+            )
+            return
+        params = {"playlistId": upload_playlist_ID}
+        walk = self.cache.lookup(
+            "playlistItems", params, refresh_within=self.refresh_within
+        )
+        if walk is not None:
+            yield from walk["pages"]
+            return
+        pages = []
+        for page in self._playlist_pages(
+            upload_playlist_ID, known_IDs, reservation
+        ):
+            pages.append(page)
+            yield page
+        self.cache.store("playlistItems", params, {"pages": pages})
+
+    def get_channel_data(self, refresh: bool = False) -> Dict[str, str]:
         """
         Requests channel metadata
 
         :params:
-            user_input (str): user inputted string
-            youtube (googlapiclient.discovery.Resource): authenticated api client
+            refresh (bool): request it even if cached e.g. to update counts
         :return: channel metadata as dict. Keys of dict:
             upload_playlist_ID (str): ID of Entire playlist uploaded on channel
             channel_name (str): Channel name
@@ -69,68 +350,137 @@ class YouTubeAPI:
             channel_description (str): the description provided by the channel
 
         """
-        channel_request = self.youtube.channels().list(
-            part="snippet,contentDetails,statistics", id=self.channel_ID
-        )
-        channel_res = channel_request.execute()
-        channel_details = channel_res["items"][0]
-        channel_statistics = channel_details["statistics"]
-        channel_snippet = channel_details["snippet"]
-
-        channel_data = dict(
-            upload_playlist_ID=channel_details["contentDetails"]["relatedPlaylists"][
-                "uploads"
-            ],
-            channel_name=channel_snippet["title"],
-            channel_subscriber_count=channel_statistics["subscriberCount"],
-            channel_video_count=channel_statistics["videoCount"],
-            channel_start_date=channel_snippet["publishedAt"],
-            channel_thumbnail_url=channel_snippet["thumbnails"]["high"]["url"],
-            channel_description=channel_snippet["description"],
-        )
-        return channel_data
+        with METRICS.stage("channel_data"):
+            channel_res = self._request(
+                "channels",
+                refresh=refresh,
+                part="snippet,contentDetails,statistics",
+                id=self.channel_ID,
+                fields=request_fields("channel"),
+            )
+        return parse_channel_response(channel_res)
 
-    def get_video_data(self) -> pd.core.frame.DataFrame:
+    def _video_pages(
+        self,
+        previous: Optional[pd.core.frame.DataFrame] = None,
+        raw: bool = False,
+    ) -> Iterator[Dict]:
         """
-        Returns video information for a YouTube channel
+        Requests statistics of videos in the uploads playlist, newest first.
+        Responses are yielded in playlist order as they arrive, so each can
+        be freed once its fields are taken.
 
-        :return:
-            df (pandas.core.frame.DataFrame): all videos in channel and data
+        :params:
+            previous (pandas.core.frame.DataFrame, optional): videos from an
+                earlier call, paging stops at them
+            raw (bool): request every field, otherwise only those in
+                schema.REQUEST_FIELDS
+        :return: videos().list responses, in playlist order
+        :rtype: Iterator[dict]
         """
         channel_data = self.get_channel_data()
-        # channel_video_count = channel_data["channel_video_count"]
         upload_playlist_ID = channel_data["upload_playlist_ID"]
+        known_IDs = set() if previous is None else set(previous["id"])
 
-        video_response = []
-        next_page_token = None
-        while True:
-            # obtaining video ID + titles
-            playlist_request = self.youtube.playlistItems().list(
-                part="snippet,contentDetails",
-                maxResults=50,  # API Limit is 50
-                pageToken=next_page_token,
-                playlistId=upload_playlist_ID,
+        # reserving quota up front, so a fetch is rejected instead of
+        # running out of quota halfway, only this fetch's requests use it
+        reservation: Optional[Reservation] = None
+        if self.scheduler is not None:
+            new_videos = int(channel_data["channel_video_count"]) - len(
+                known_IDs
             )
-            playlist_response = playlist_request.execute()
-            # isolating video ID
-            vid_subset = [
-                vid_ID["contentDetails"]["videoId"]
-                for vid_ID in playlist_response["items"]
-            ]
-            # retrieving video statistics
-            vid_info_subset_request = self.youtube.videos().list(
-                part="snippet,contentDetails,statistics", id=vid_subset
-            )
-            vid_info_subset_response = vid_info_subset_request.execute()
-            video_response.append(vid_info_subset_response)
-            # obtaining page token
-            next_page_token = playlist_response.get(
-                "nextPageToken"
-            )  # get method used because token may not exist
-            if next_page_token is None:
-                break
+            reservation = self.scheduler.reserve(channel_cost(new_videos))
+
+        video_fields = None if raw else request_fields("videos")
+        try:
+            # statistics are requested on worker threads so only paging is serial
+            pending: Deque[Future] = deque()
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for vid_subset in self._upload_pages(
+                    upload_playlist_ID, known_IDs, reservation
+                ):
+                    # retrieving video statistics
+                    if vid_subset:
+                        pending.append(
+                            executor.submit(
+                                self._request,
+                                "videos",
+                                part="snippet,contentDetails,statistics",
+                                id=vid_subset,
+                                fields=video_fields,
+                                reservation=reservation,
+                            )
+                        )
+                    # handing over statistics that have arrived, in order
+                    while pending and pending[0].done():
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+        finally:
+            if self.scheduler is not None and reservation is not None:
+                self.scheduler.release(reservation)
+
+    def iter_video_frames(
+        self,
+        previous: Optional[pd.core.frame.DataFrame] = None,
+        raw: bool = False,
+    ) -> Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields video information a page (up to 50 videos) at a time, newest
+        first, see get_video_data()
+
+        :params:
+            previous (pandas.core.frame.DataFrame, optional): videos from an
+                earlier call, only newer videos are yielded
+            raw (bool): keep every field of the response
+        :return: dataframe per page
+        :rtype: Iterator[pandas.core.frame.DataFrame]
+        """
+        for response in self._video_pages(previous, raw=raw):
+            if raw:
+                yield pd.json_normalize(response["items"])
+            else:
+                yield pd.DataFrame(extract_video_columns(response["items"]))
+
+    def get_video_data(
+        self,
+        previous: Optional[pd.core.frame.DataFrame] = None,
+        raw: bool = False,
+    ) -> pd.core.frame.DataFrame:
+        """
+        Returns video information for a YouTube channel
+
+        :params:
+            previous (pandas.core.frame.DataFrame, optional): videos from an
+                earlier call. Only videos uploaded since are requested, as
+                the uploads playlist is newest first paging stops at the first
+                known video. Statistics of previous videos are not updated.
+            raw (bool): keep every field of the response, otherwise only the
+                columns in schema.VIDEO_COLUMNS are kept
+        :return:
+            df (pandas.core.frame.DataFrame): all videos in channel and data
+        """
+        with METRICS.stage("fetch_videos"):
+            if raw:
+                frames = list(self.iter_video_frames(previous, raw=True))
+                df = pd.concat(frames, ignore_index=True) if frames else None
+            else:
+                # fields are taken out of each response as it arrives
+                buffers = new_video_buffers()
+                for response in self._video_pages(previous):
+                    extract_video_columns(response["items"], buffers)
+                df = pd.DataFrame(buffers) if buffers["id"] else None
+        METRICS.inc(
+            "tubestats_rows_total",
+            0 if df is None else len(df),
+            stage="fetch_videos",
+        )
 
-        df = pd.json_normalize(video_response, "items")
+        if previous is None:
+            return prune_video_data(pd.DataFrame()) if df is None else df
+        if df is None:
+            return previous
+        df = pd.concat([df, previous], ignore_index=True)
         return df
 
 
@@ -0,0 +1,436 @@
+#!usr/bin/env python3
+# tubestats/async_api.py - asynchronous counterpart of tubestats/api.py
+#                        - shares a pooled aiohttp session between requests
+#                        - fetches many channels concurrently
+#                        - accounts quota, caches and records metrics as
+#                          tubestats/api.py does
+#
+# by Shivan Sivakumaran
+
+import asyncio
+import functools
+import os
+import time
+from typing import (
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import pandas as pd
+
+from tubestats.api import parse_channel_response, parse_playlist_response
+from tubestats.cache import ResponseCache
+from tubestats.metrics import METRICS
+from tubestats.parser import parse_input
+from tubestats.quota import (
+    QUOTA_COSTS,
+    QuotaScheduler,
+    Reservation,
+    channel_cost,
+)
+from tubestats.schema import (
+    extract_video_columns,
+    new_video_buffers,
+    prune_video_data,
+    request_fields,
+)
+
+API_URL = "https://www.googleapis.com/"
+API_PATH = "youtube/v3/"
+
+
+def create_session(limit: int = 100):
+    """
+    Creates a HTTP session with a pool of keep-alive connections
+
+    :params:
+        limit (int): maximum connections open at once
+    :return: session
+    :rtype: aiohttp.ClientSession
+    """
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError(
+            "aiohttp is required for the async client, "
+            "install with `pip install tubestats[async]`"
+        ) from e
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=limit),
+        raise_for_status=True,
+    )
+
+
+async def cancel_all(tasks: Sequence[asyncio.Future]) -> None:
+    """
+    Cancels tasks and waits for them to finish, so none are left running
+    on a session that is about to close
+
+    :params:
+        tasks (sequence): futures, those done are left as they are
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncYouTubeAPI:
+    """
+    Connects to the YouTube API without blocking, methods are coroutines.
+    Use as an async context manager to close the session it creates.
+
+    :params:
+        user_input (str)
+        session (aiohttp.ClientSession, optional): shared between clients,
+            created if not given
+        cache (ResponseCache, optional): stores responses between requests,
+            shared with YouTubeAPI. Only fresh responses are served, see
+            ResponseCache.lookup()
+        scheduler (QuotaScheduler, optional): accounts for quota used
+    :methods:
+        get_channel_data(): returns channel data
+        get_video_data(): gets videos data
+    """
+
+    def __init__(
+        self,
+        user_input: str,
+        session=None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+    ):
+        self.user_input = user_input
+        self.session = session
+        self._owns_session = session is None
+        self.cache = cache
+        self.scheduler = scheduler
+        self.channel_ID: Optional[str] = None
+
+    async def __aenter__(self):
+        if self.session is None:
+            self.session = create_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _call(
+        self,
+        endpoint: str,
+        reservation: Optional[Reservation] = None,
+        **params,
+    ) -> Dict:
+        """
+        Executes a list request on an endpoint, without the cache
+
+        :params:
+            endpoint (str): 'channels', 'playlistItems' or 'videos'
+            reservation (Reservation, optional): quota of the fetch the
+                request belongs to
+            **params: query parameters, lists are joined by commas
+        :return: response
+        :rtype: dict
+        """
+        costs = QUOTA_COSTS
+        if self.scheduler is not None:
+            # waiting for the rate limit off the event loop
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                functools.partial(
+                    self.scheduler.acquire, endpoint, reservation=reservation
+                ),
+            )
+            costs = self.scheduler.costs
+        METRICS.inc("tubestats_api_calls_total", endpoint=endpoint)
+        METRICS.inc(
+            "tubestats_quota_units_total",
+            costs.get(endpoint, 1),
+            endpoint=endpoint,
+        )
+        if self.session is None:
+            self.session = create_session()
+        query = {
+            key: ",".join(value) if isinstance(value, list) else value
+            for key, value in params.items()
+            if value is not None
+        }
+        query["key"] = os.getenv("YT_API_KEY", "")
+        url = os.getenv("YT_API_BASE_URL", API_URL) + API_PATH + endpoint
+        start = time.perf_counter()
+        try:
+            async with self.session.get(url, params=query) as res:
+                return await res.json()
+        finally:
+            METRICS.observe(
+                "tubestats_api_request_seconds",
+                time.perf_counter() - start,
+                endpoint=endpoint,
+            )
+
+    async def _request(
+        self,
+        endpoint: str,
+        reservation: Optional[Reservation] = None,
+        **params,
+    ) -> Dict:
+        """
+        Executes a list request on an endpoint, going through the cache if
+        set
+
+        :params:
+            endpoint (str): 'channels' or 'videos'
+            reservation (Reservation, optional): quota of the fetch the
+                request belongs to
+            **params: query parameters, form the key as in YouTubeAPI
+        :return: response
+        :rtype: dict
+        """
+        if self.cache is not None:
+            value = self.cache.lookup(endpoint, params)
+            if value is not None:
+                return value
+        value = await self._call(endpoint, reservation=reservation, **params)
+        if self.cache is not None:
+            self.cache.store(endpoint, params, value)
+        return value
+
+    async def _playlist_pages(
+        self,
+        upload_playlist_ID: str,
+        known_IDs: Set[str],
+        reservation: Optional[Reservation] = None,
+    ) -> AsyncIterator[List[str]]:
+        """
+        Requests the uploads playlist a page at a time, see
+        YouTubeAPI._playlist_pages()
+
+        :params:
+            upload_playlist_ID (str)
+            known_IDs (set): paging stops at the first of these
+            reservation (Reservation, optional): quota of the fetch
+        :return: video IDs of each page, newest first
+        :rtype: AsyncIterator[List[str]]
+        """
+        next_page_token = None
+        while True:
+            playlist_response = await self._call(
+                "playlistItems",
+                reservation=reservation,
+                part="contentDetails",
+                maxResults=50,  # API Limit is 50
+                pageToken=next_page_token,
+                playlistId=upload_playlist_ID,
+                fields=request_fields("playlist"),
+            )
+            METRICS.inc("tubestats_pages_total")
+            vid_subset, next_page_token = parse_playlist_response(
+                playlist_response, known_IDs
+            )
+            yield vid_subset
+            if next_page_token is None:
+                return
+
+    async def _upload_pages(
+        self,
+        upload_playlist_ID: str,
+        known_IDs: Set[str],
+        reservation: Optional[Reservation] = None,
+    ) -> AsyncIterator[List[str]]:
+        """
+        Video IDs of the uploads playlist a page at a time, a whole walk is
+        cached as one entry, see YouTubeAPI._upload_pages()
+
+        :params:
+            upload_playlist_ID (str)
+            known_IDs (set): paging stops at the first of these
+            reservation (Reservation, optional): quota of the fetch
+        :return: video IDs of each page, newest first
+        :rtype: AsyncIterator[List[str]]
+        """
+        pages = self._playlist_pages(
+            upload_playlist_ID, known_IDs, reservation
+        )
+        if self.cache is None or known_IDs:
+            async for page in pages:
+                yield page
+            return
+        params = {"playlistId": upload_playlist_ID}
+        walk = self.cache.lookup("playlistItems", params)
+        if walk is not None:
+            for page in walk["pages"]:
+                yield page
+            return
+        walked = []
+        async for page in pages:
+            walked.append(page)
+            yield page
+        self.cache.store("playlistItems", params, {"pages": walked})
+
+    async def resolve_channel_ID(self) -> str:
+        """
+        Parses user input to a channel ID, see parser.channel_parser()
+
+        :return: channel_ID
+        :rtype: str
+        """
+        if self.channel_ID is not None:
+            return self.channel_ID
+        kind, value = parse_input(self.user_input)
+        if kind == "channel":
+            self.channel_ID = value
+        elif kind == "user":
+            response = await self._request(
+                "channels",
+                part="id",
+                forUsername=value,
+                fields=request_fields("username_channel"),
+            )
+            self.channel_ID = response["items"][0]["id"]
+        else:
+            response = await self._request(
+                "videos",
+                part="snippet",
+                id=value,
+                fields=request_fields("video_channel"),
+            )
+            self.channel_ID = response["items"][0]["snippet"]["channelId"]
+        return self.channel_ID
+
+    async def get_channel_data(self) -> Dict[str, str]:
+        """
+        Requests channel metadata
+
+        :return: channel metadata, see YouTubeAPI.get_channel_data()
+        :rtype: dict
+        """
+        channel_res = await self._request(
+            "channels",
+            part="snippet,contentDetails,statistics",
+            id=await self.resolve_channel_ID(),
+            fields=request_fields("channel"),
+        )
+        return parse_channel_response(channel_res)
+
+    async def get_video_data(
+        self,
+        previous: Optional[pd.core.frame.DataFrame] = None,
+        raw: bool = False,
+        channel_data: Optional[Dict[str, str]] = None,
+    ) -> pd.core.frame.DataFrame:
+        """
+        Returns video information for a YouTube channel
+
+        :params:
+            previous (pandas.core.frame.DataFrame, optional): videos from an
+                earlier call, see YouTubeAPI.get_video_data()
+            raw (bool): keep every field of the response
+            channel_data (dict, optional): from get_channel_data(), requested
+                again if not given
+        :return:
+            df (pandas.core.frame.DataFrame): all videos in channel and data
+        """
+        if channel_data is None:
+            channel_data = await self.get_channel_data()
+        upload_playlist_ID = channel_data["upload_playlist_ID"]
+        known_IDs = set() if previous is None else set(previous["id"])
+
+        # reserving quota up front, see YouTubeAPI._video_pages()
+        reservation: Optional[Reservation] = None
+        if self.scheduler is not None:
+            new_videos = int(channel_data["channel_video_count"]) - len(
+                known_IDs
+            )
+            reservation = self.scheduler.reserve(channel_cost(new_videos))
+
+        video_fields = None if raw else request_fields("videos")
+
+        # statistics are requested concurrently so only paging is serial
+        tasks: List[asyncio.Future] = []
+        try:
+            async for vid_subset in self._upload_pages(
+                upload_playlist_ID, known_IDs, reservation
+            ):
+                if vid_subset:
+                    tasks.append(
+                        asyncio.ensure_future(
+                            self._request(
+                                "videos",
+                                reservation=reservation,
+                                part="snippet,contentDetails,statistics",
+                                id=vid_subset,
+                                fields=video_fields,
+                            )
+                        )
+                    )
+            video_response = await asyncio.gather(*tasks)
+        except BaseException:
+            # not leaving requests running when one fails
+            await cancel_all(tasks)
+            raise
+        finally:
+            if self.scheduler is not None and reservation is not None:
+                self.scheduler.release(reservation)
+
+        if raw:
+            df = pd.json_normalize(video_response, "items")
+        else:
+            buffers = new_video_buffers()
+            for response in video_response:
+                extract_video_columns(response["items"], buffers)
+            df = prune_video_data(pd.DataFrame(buffers))
+        if previous is None:
+            return df
+        if not video_response:
+            return previous
+        df = pd.concat([df, previous], ignore_index=True)
+        return df
+
+
+async def fetch_channels(
+    user_inputs: Iterable[str],
+    concurrency: int = 100,
+    cache: Optional[ResponseCache] = None,
+    scheduler: Optional[QuotaScheduler] = None,
+) -> List[Tuple[Dict[str, str], pd.core.frame.DataFrame]]:
+    """
+    Fetches channel data and video data for many channels over one session.
+    If a channel fails the others are cancelled and the error is raised.
+
+    :params:
+        user_inputs (iterable): channel IDs or links
+        concurrency (int): channels fetched at once
+        cache (ResponseCache, optional): stores responses between requests
+        scheduler (QuotaScheduler, optional): accounts for quota used
+    :return: channel data and video data, in the order of user_inputs
+    :rtype: List[Tuple[dict, pandas.core.frame.DataFrame]]
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(session, user_input: str):
+        async with semaphore:
+            yt = AsyncYouTubeAPI(
+                user_input, session=session, cache=cache, scheduler=scheduler
+            )
+            channel_data = await yt.get_channel_data()
+            return channel_data, await yt.get_video_data(
+                channel_data=channel_data
+            )
+
+    async with create_session(limit=concurrency) as session:
+        tasks = [
+            asyncio.ensure_future(fetch(session, user_input))
+            for user_input in user_inputs
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            await cancel_all(tasks)
+            raise
@@ -0,0 +1,194 @@
+#!usr/bin/env python3
+# tubestats/batch.py - analyses many channels without the streamlit app
+#                    - reads channel IDs or links from a file or stdin
+#                    - fans channels out across a process pool
+#                    - writes a summary per channel as JSON Lines
+#
+# by Shivan Sivakumaran
+
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from tubestats.api import create_api
+from tubestats.cache import SQLiteCache
+from tubestats.data import YouTubeData
+from tubestats.parser import ChannelResolver
+
+# set in each worker process by _init_worker()
+_cache: Optional[SQLiteCache] = None
+
+
+def read_inputs(lines: Iterable[str]) -> List[str]:
+    """
+    Reads channel IDs or links, one per line. Blank lines and lines starting
+    with '#' are skipped.
+
+    :params:
+        lines (iterable): lines of a file
+    :return: user inputs
+    :rtype: List[str]
+    """
+    user_inputs = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            user_inputs.append(line)
+    return user_inputs
+
+
+def resolve_inputs(
+    user_inputs: List[str], cache_path: Optional[str] = None
+) -> List[Optional[str]]:
+    """
+    Resolves inputs to channel IDs before they are handed to workers, 50
+    video links to a request, see parser.ChannelResolver
+
+    :params:
+        user_inputs (list): channel IDs or links
+        cache_path (str, optional): SQLite cache keeping lookups
+    :return: channel IDs, None for inputs left for the workers to resolve
+    :rtype: List[Optional[str]]
+    """
+    if not user_inputs:
+        return []
+    try:
+        cache = None if cache_path is None else SQLiteCache(cache_path)
+        resolver = ChannelResolver(create_api(), cache=cache)
+        return resolver.resolve_many(user_inputs)
+    except Exception:
+        logging.error("Error on resolving channels", exc_info=True)
+        return [None] * len(user_inputs)
+
+
+def channel_summary(
+    user_input: str,
+    youtuber_data: Optional[YouTubeData] = None,
+    channel_ID: Optional[str] = None,
+) -> Dict:
+    """
+    Summarises a channel: totals, watchtime and time difference quantiles
+
+    :params:
+        user_input (str): channel ID or link
+        youtuber_data (YouTubeData, optional): fetched if not given
+        channel_ID (str, optional): channel of user_input, if resolved
+    :return: summary, serialisable as JSON
+    :rtype: dict
+    """
+    if youtuber_data is None:
+        youtuber_data = YouTubeData(channel_ID or user_input, cache=_cache)
+    time_df = youtuber_data.time_difference_calculate(
+        youtuber_data.dataframe()
+    )
+    quantiles = youtuber_data.time_difference_statistics(time_df)
+    summary = dict(
+        input=user_input,
+        channel_name=youtuber_data.channel_name(),
+        video_count=youtuber_data.video_count(),
+        total_views=int(youtuber_data.total_channel_views()),
+        total_comments=int(youtuber_data.total_comments()),
+        total_watchtime_seconds=(
+            youtuber_data.total_watchtime().total_seconds()
+        ),
+        time_diff_quantiles={
+            str(quantile): float(days) for quantile, days in quantiles.items()
+        },
+    )
+    return summary
+
+
+def _summarise(user_input: str, channel_ID: Optional[str] = None) -> Dict:
+    """Summarises a channel, returning the error instead of raising"""
+    try:
+        return channel_summary(user_input, channel_ID=channel_ID)
+    except Exception as e:
+        return dict(input=user_input, error=repr(e))
+
+
+def _init_worker(cache_path: Optional[str]) -> None:
+    """Opens the response cache once per worker process"""
+    global _cache
+    if cache_path is not None:
+        _cache = SQLiteCache(cache_path)
+
+
+def run(
+    user_inputs: List[str],
+    output: TextIO,
+    workers: Optional[int] = None,
+    cache_path: Optional[str] = None,
+) -> int:
+    """
+    Summarises channels across a process pool, writing each summary as a
+    JSON line as soon as its channel finishes
+
+    :params:
+        user_inputs (list): channel IDs or links
+        output (file): where JSON Lines are written
+        workers (int, optional): processes, defaults to number of CPUs
+        cache_path (str, optional): SQLite response cache shared by workers
+    :return: number of channels that failed
+    :rtype: int
+    """
+    failed = 0
+    channel_IDs = resolve_inputs(user_inputs, cache_path)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(cache_path,),
+    ) as executor:
+        futures = [
+            executor.submit(_summarise, user_input, channel_ID)
+            for user_input, channel_ID in zip(user_inputs, channel_IDs)
+        ]
+        for future in as_completed(futures):
+            summary = future.result()
+            failed += "error" in summary
+            output.write(json.dumps(summary) + "\n")
+            output.flush()
+    return failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m tubestats",
+        description="Summarise YouTube channels as JSON Lines",
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="file of channel IDs or links, one per line (default: stdin)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes",
+    )
+    parser.add_argument(
+        "--cache",
+        default=os.getenv("TUBESTATS_CACHE_PATH"),
+        help="SQLite file caching API responses",
+    )
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        user_inputs = read_inputs(sys.stdin)
+    else:
+        with open(args.input) as f:
+            user_inputs = read_inputs(f)
+    failed = run(
+        user_inputs, sys.stdout, workers=args.workers, cache_path=args.cache
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
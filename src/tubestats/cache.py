@@ -0,0 +1,232 @@
+#!usr/bin/env python3
+# tubestats/cache.py - persistent cache for YouTube API responses
+#                    - time to live (TTL) set per endpoint
+#                    - evicts least recently used entries past a size cap
+#                    - optionally serves stale entries while revalidating
+#
+# by Shivan Sivakumaran
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# seconds a response is considered fresh, by endpoint
+DEFAULT_TTLS = {
+    "channels": 24 * 60 * 60,
+    "playlistItems": 60 * 60,
+    "videos": 6 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+
+def make_key(endpoint: str, params: Dict) -> str:
+    """
+    Creates a cache key from an endpoint and its request parameters
+
+    :params:
+        endpoint (str): API endpoint e.g. 'videos'
+        params (dict): parameters passed to the endpoint's list()
+    :return: key
+    :rtype: str
+    """
+    return endpoint + ":" + json.dumps(params, sort_keys=True, default=str)
+
+
+class ResponseCache(ABC):
+    """
+    Base class for API response caches. Subclasses provide storage through
+    get() and set(), freshness rules are handled here.
+
+    :params:
+        ttls (dict, optional): seconds a response stays fresh, by endpoint
+        stale_ttl (int, optional): seconds past the TTL a response is still
+            served while it is refreshed in the background (stale-while-revalidate)
+    :methods:
+        get(): returns stored response and time stored
+        set(): stores response
+        fetch(): returns cached response, or requests and stores it
+        lookup(): returns cached response if fresh
+        store(): stores response of an endpoint
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, stale_ttl=0):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self._revalidating: Set[str] = set()
+        self._revalidating_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        """Returns the stored response and time it was stored, if stored"""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict) -> None:
+        """Stores a response"""
+
+    def lookup(
+        self, endpoint: str, params: Dict, refresh_within: float = 0
+    ) -> Optional[Dict]:
+        """
+        Returns a response from the cache if fresh, without requesting it.
+        For responses built over many requests, stored with store().
+
+        :params:
+            endpoint (str): API endpoint e.g. 'playlistItems', sets the TTL
+            params (dict): forms the key
+            refresh_within (float): seconds, responses that expire sooner
+                are not returned
+        :return: response, None if not stored or not fresh
+        :rtype: Optional[dict]
+        """
+        entry = self.get(make_key(endpoint, params))
+        if entry is None:
+            return None
+        value, stored_at = entry
+        ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+        if time.time() - stored_at < ttl - refresh_within:
+            return value
+        return None
+
+    def store(self, endpoint: str, params: Dict, value: Dict) -> None:
+        """
+        Stores a response for lookup()
+
+        :params:
+            endpoint (str)
+            params (dict)
+            value (dict): response
+        """
+        self.set(make_key(endpoint, params), value)
+
+    def fetch(
+        self,
+        endpoint: str,
+        params: Dict,
+        request: Callable[[], Dict],
+        refresh: bool = False,
+        refresh_within: float = 0,
+    ) -> Dict:
+        """
+        Returns a response from the cache, otherwise calls request
+
+        :params:
+            endpoint (str): API endpoint e.g. 'videos'
+            params (dict): parameters of the request, forms the key
+            request (callable): performs the request, returns response
+            refresh (bool): skip the cache lookup and store a new response
+            refresh_within (float): seconds, responses that expire sooner are
+                requested again instead of served, e.g. by the cache warmer
+        :return: response
+        :rtype: dict
+        """
+        key = make_key(endpoint, params)
+        if not refresh:
+            entry = self.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.time() - stored_at
+                ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+                if age < ttl - refresh_within:
+                    return value
+                if not refresh_within and age < ttl + self.stale_ttl:
+                    self._revalidate(key, request)
+                    return value
+        value = request()
+        self.set(key, value)
+        return value
+
+    def _revalidate(self, key: str, request: Callable[[], Dict]) -> None:
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        threading.Thread(
+            target=self._refresh, args=(key, request), daemon=True
+        ).start()
+
+    def _refresh(self, key: str, request: Callable[[], Dict]) -> None:
+        try:
+            self.set(key, request())
+        except Exception:
+            logging.error("Error on revalidating cache", exc_info=True)
+        finally:
+            with self._revalidating_lock:
+                self._revalidating.discard(key)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Response cache stored in a SQLite database, survives restarts
+
+    :params:
+        path (str): database file, ':memory:' for a non-persistent cache
+        max_entries (int): entries kept before least recently used are evicted
+        ttls (dict, optional): seconds a response stays fresh, by endpoint
+        stale_ttl (int, optional): seconds stale responses are served for
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int = 10000,
+        ttls: Optional[Dict[str, int]] = None,
+        stale_ttl: int = 0,
+    ):
+        super().__init__(ttls=ttls, stale_ttl=stale_ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Dict) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # evicting least recently used past the cap
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
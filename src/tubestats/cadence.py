@@ -0,0 +1,173 @@
+#!usr/bin/env python3
+# tubestats/cadence.py - upload cadence of a channel over time
+#                      - weekly and monthly upload counts
+#                      - rolling median gap and views per upload
+#                      - updated with new videos only
+#
+# by Shivan Sivakumaran
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+PUBLISHED_AT = "snippet.publishedAt_REFORMATED"
+VIEWS = "statistics.viewCount"
+
+# uploads the rolling statistics are taken over
+DEFAULT_WINDOW = 10
+
+
+def _period_counts(published: pd.Series, freq: str) -> pd.Series:
+    """Uploads per period, including periods without uploads"""
+    starts = published.dt.to_period(freq).dt.start_time
+    counts = starts.value_counts().sort_index().rename("uploads")
+    if counts.empty:
+        return pd.Series(
+            [], dtype="int32", index=pd.DatetimeIndex([]), name="uploads"
+        )
+    index = pd.period_range(
+        counts.index[0], counts.index[-1], freq=freq
+    ).start_time
+    return counts.reindex(index, fill_value=0).astype("int32")
+
+
+def _add_counts(counts: pd.Series, new: pd.Series, freq: str) -> pd.Series:
+    """Adds counts of later uploads, filling periods in between with 0"""
+    if counts.empty or new.empty:
+        return new if counts.empty else counts
+    # periods from the last counted through the newest upload
+    index = pd.period_range(
+        counts.index[-1], new.index[-1], freq=freq
+    ).start_time
+    new = new.reindex(index, fill_value=0)
+    new.iloc[0] += counts.iloc[-1]
+    return pd.concat([counts.iloc[:-1], new]).astype("int32")
+
+
+class Cadence:
+    """
+    Upload cadence of a channel: uploads per week and month, and the
+    median gap and mean views over the last uploads at each upload
+
+    :params:
+        weekly (pandas.Series): uploads per week, by week start
+        monthly (pandas.Series): uploads per month, by month start
+        rolling (pandas.DataFrame): per upload, oldest first, columns
+            published, gap_days, views, median_gap_days, mean_views
+        window (int): uploads the rolling statistics are taken over
+    :methods:
+        from_dataframe(): works out cadence of every video
+        update(): adds videos uploaded since
+    """
+
+    def __init__(
+        self,
+        weekly: pd.Series,
+        monthly: pd.Series,
+        rolling: pd.core.frame.DataFrame,
+        window: int = DEFAULT_WINDOW,
+    ):
+        self.weekly = weekly
+        self.monthly = monthly
+        self.rolling = rolling
+        self.window = window
+
+    @classmethod
+    def from_dataframe(
+        cls, df: pd.core.frame.DataFrame, window: int = DEFAULT_WINDOW
+    ) -> "Cadence":
+        """
+        Works out cadence from scratch
+
+        :params:
+            df (pandas.core.frame.DataFrame): YouTubeData.dataframe()
+            window (int): uploads the rolling statistics are taken over
+        :return: cadence
+        :rtype: Cadence
+        """
+        published = df[PUBLISHED_AT]
+        return cls(
+            weekly=_period_counts(published, "W"),
+            monthly=_period_counts(published, "M"),
+            rolling=cls._rolling(None, df, window),
+            window=window,
+        )
+
+    @staticmethod
+    def _rolling(
+        previous: Optional[pd.core.frame.DataFrame],
+        df: pd.core.frame.DataFrame,
+        window: int,
+    ) -> pd.core.frame.DataFrame:
+        """Rolling statistics of uploads, continuing from previous ones"""
+        new = pd.DataFrame(
+            {
+                "published": df[PUBLISHED_AT].to_numpy(),
+                "views": df[VIEWS].to_numpy().astype("int64"),
+            }
+        )
+        # only the last window uploads are needed to continue
+        tail = previous.iloc[-window:] if previous is not None else None
+        joined = pd.concat(
+            [None if tail is None else tail[["published", "views"]], new],
+            ignore_index=True,
+        )
+        gaps = joined["published"].diff().dt.total_seconds() / (24 * 60 * 60)
+        n_tail = 0
+        if tail is not None:
+            n_tail = len(tail)
+            gaps.iloc[:n_tail] = tail["gap_days"].to_numpy()
+        rolled = joined.assign(
+            gap_days=gaps.astype("float32"),
+            median_gap_days=gaps.rolling(window, min_periods=1)
+            .median()
+            .astype("float32"),
+            mean_views=joined["views"]
+            .rolling(window, min_periods=1)
+            .mean()
+            .astype("float32"),
+        )
+        return rolled.iloc[n_tail:].reset_index(drop=True)
+
+    def update(self, df: pd.core.frame.DataFrame) -> int:
+        """
+        Adds videos uploaded after the last one counted. Only the new
+        videos are looked at, found by binary search as df is sorted by
+        upload date. Works cadence out from scratch if videos were
+        deleted or uploaded out of order.
+
+        :params:
+            df (pandas.core.frame.DataFrame): YouTubeData.dataframe(), all
+                videos of the channel
+        :return: number of new videos
+        :rtype: int
+        """
+        counted = len(self.rolling)
+        start = 0
+        if counted:
+            last = np.datetime64(self.rolling["published"].iloc[-1])
+            start = df[PUBLISHED_AT].to_numpy().searchsorted(last, "right")
+        if start != counted:
+            rebuilt = Cadence.from_dataframe(df, window=self.window)
+            self.weekly = rebuilt.weekly
+            self.monthly = rebuilt.monthly
+            self.rolling = rebuilt.rolling
+            return max(len(df) - counted, 0)
+
+        new_df = df.iloc[start:]
+        if new_df.empty:
+            return 0
+        published = new_df[PUBLISHED_AT]
+        self.weekly = _add_counts(
+            self.weekly, _period_counts(published, "W"), "W"
+        )
+        self.monthly = _add_counts(
+            self.monthly, _period_counts(published, "M"), "M"
+        )
+        previous = self.rolling if counted else None
+        self.rolling = pd.concat(
+            [self.rolling, self._rolling(previous, new_df, self.window)],
+            ignore_index=True,
+        )
+        return len(new_df)
@@ -6,12 +6,209 @@
 
 import re
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-import altair as alt
-import isodate
+import numpy as np
 import pandas as pd
-from api import YouTubeAPI
+from tubestats.api import YouTubeAPI
+from tubestats.metrics import METRICS
+from tubestats.schema import COUNT_DTYPES, VIDEO_COLUMNS, prune_video_data
+
+# charting is imported by the chart methods, fetching and statistics do
+# not need it
+if TYPE_CHECKING:
+    import altair as alt
+
+# ISO8061 durations as used by YouTube e.g. PT1H2M3S, P1DT2H, P0D
+ISO8061_DURATION = re.compile(
+    r"^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?"
+    r"(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+# videos plotted before charts are downsampled, Altair refuses past 5000
+CHART_MAX_ROWS = 2000
+# points kept per date bin when downsampling
+CHART_POINTS_PER_BIN = 5
+
+DURATION_SECONDS = dict(
+    weeks=7 * 24 * 60 * 60,
+    days=24 * 60 * 60,
+    hours=60 * 60,
+    minutes=60,
+    seconds=1,
+)
+
+
+def parse_published_at(published_at: pd.Series) -> pd.Series:
+    """
+    Parses upload timestamps e.g. 2021-10-09T15:00:17Z
+
+    :params:
+        published_at (pandas.Series): timestamps as str
+    :return: timestamps
+    :rtype: pandas.Series of datetime64[ns]
+    """
+    # dropping the 'Z' keeps pandas on its fast ISO8061 path, as strings
+    # even when empty e.g. a channel with no uploads
+    return pd.to_datetime(
+        published_at.astype("string").str.slice(0, 19),
+        format="%Y-%m-%dT%H:%M:%S",
+    )
+
+
+def parse_durations(durations: pd.Series) -> pd.Series:
+    """
+    Parses ISO8061 video durations. Durations not in the form YouTube uses
+    (e.g. with years or months) are left to isodate, missing ones are zero.
+
+    :params:
+        durations (pandas.Series): durations as str
+    :return: durations
+    :rtype: pandas.Series of timedelta64[ns]
+    """
+    # many videos share a duration, so only unique durations are parsed
+    codes, uniques = pd.factorize(durations)
+    uniques = pd.Series(uniques, dtype=object)
+    parts = uniques.str.extract(ISO8061_DURATION).astype(float)
+    seconds = (
+        parts.fillna(0).to_numpy()
+        @ pd.Series(DURATION_SECONDS)[parts.columns].to_numpy()
+    )
+
+    unmatched = parts.isna().all(axis=1) & uniques.map(
+        lambda x: isinstance(x, str)
+    )
+    for i in unmatched[unmatched].index:
+        seconds[i] = _parse_duration(uniques[i]).total_seconds()
+
+    # missing durations have code -1
+    seconds = np.append(seconds, 0)[codes]
+    return pd.Series(pd.to_timedelta(seconds, unit="s"), index=durations.index)
+
+
+def _parse_duration(duration: str) -> timedelta:
+    """Parses an ISO8061 duration with isodate, from the epoch if in years"""
+    import isodate
+
+    parsed = isodate.parse_duration(duration)
+    if isinstance(parsed, isodate.Duration):
+        parsed = parsed.totimedelta(start=datetime(1970, 1, 1))
+    return parsed
+
+
+def top_k(
+    df: pd.core.frame.DataFrame,
+    column: str,
+    num: int,
+    columns: Optional[List[str]] = None,
+) -> pd.core.frame.DataFrame:
+    """
+    Rows with the largest values of a column, largest first. Found by
+    partial selection in O(n) rather than sorting every row, and ties keep
+    their order in df.
+
+    :params:
+        df (pandas.core.frame.DataFrame)
+        column (str): column ranked by
+        num (int): rows returned
+        columns (list, optional): columns returned, all if not given
+    :return: df
+    :rtype: pandas.core.frame.DataFrame
+    """
+    negated = -df[column].to_numpy()
+    num = max(min(int(num), len(negated)), 0)
+    if 0 < num < len(negated):
+        kth = np.partition(negated, num - 1)[num - 1]
+        above = np.flatnonzero(negated < kth)
+        tied = np.flatnonzero(negated == kth)[: num - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(negated) if num else 0)
+    positions = candidates[np.lexsort((candidates, negated[candidates]))]
+    if columns is not None:
+        df = df[columns]
+    return df.take(positions)
+
+
+def rank_order(values: np.ndarray) -> np.ndarray:
+    """
+    Positions of values from largest to smallest, ties in order
+
+    :params:
+        values (numpy.ndarray)
+    :return: positions
+    :rtype: numpy.ndarray
+    """
+    return np.argsort(-values, kind="stable")
+
+
+def first_in_window(
+    order: np.ndarray, start: int, end: int, num: int
+) -> np.ndarray:
+    """
+    First num positions of a rank order between start and end, scanning
+    only as much of the order as needed
+
+    :params:
+        order (numpy.ndarray): positions, see rank_order()
+        start (int): first position in the window
+        end (int): position after the window
+        num (int): positions returned
+    :return: positions
+    :rtype: numpy.ndarray
+    """
+    found: List[np.ndarray] = []
+    n_found = 0
+    i, chunk = 0, max(4 * num, 64)
+    while n_found < num and i < len(order):
+        block = order[i : i + chunk]
+        hits = block[(block >= start) & (block < end)]
+        found.append(hits)
+        n_found += len(hits)
+        i, chunk = i + chunk, chunk * 2
+    if not found:
+        return order[:0]
+    return np.concatenate(found)[:num]
+
+
+def downsample(
+    df: pd.core.frame.DataFrame,
+    bin_column: str,
+    keep_column: str,
+    max_rows: int = CHART_MAX_ROWS,
+    points_per_bin: int = CHART_POINTS_PER_BIN,
+) -> pd.core.frame.DataFrame:
+    """
+    Cuts rows down to at most max_rows for plotting. Rows are put in equal
+    width bins of bin_column, and the rows with the largest keep_column in
+    each bin are kept, so outliers such as viral videos stay on the chart.
+
+    :params:
+        df (pandas.core.frame.DataFrame)
+        bin_column (str): column binned, e.g. upload date
+        keep_column (str): largest values kept in each bin, e.g. views
+        max_rows (int): rows returned at most
+        points_per_bin (int): rows kept in each bin
+    :return: df, in the same order
+    :rtype: pandas.core.frame.DataFrame
+    """
+    if len(df) <= max_rows:
+        return df
+    n_bins = max(max_rows // points_per_bin, 1)
+    points_per_bin = max_rows // n_bins
+    x = df[bin_column].to_numpy().astype("float64")
+    span = x.max() - x.min()
+    bins = np.zeros(len(x), dtype=np.int64)
+    if span > 0:
+        bins = ((x - x.min()) / span * n_bins).astype(np.int64)
+        bins = np.minimum(bins, n_bins - 1)
+    # rows grouped by bin, largest first, then numbered within their bin
+    order = np.lexsort((-df[keep_column].to_numpy(), bins))
+    sorted_bins = bins[order]
+    bin_starts = np.searchsorted(sorted_bins, sorted_bins, side="left")
+    within_bin = np.arange(len(order)) - bin_starts
+    positions = np.sort(order[within_bin < points_per_bin])
+    return df.take(positions)
 
 
 class YouTubeData:
@@ -22,18 +219,91 @@ class YouTubeData:
         channel_ID (str): channel_ID
         channel_data (optional): used for testing
         df (optional): used for testing
+        cache (ResponseCache, optional): cache for API responses
+        scheduler (QuotaScheduler, optional): accounts for quota used
+        keep_raw (bool): keep every field of the video data as returned
+            next to the parsed columns, otherwise only the columns in
+            schema.VIDEO_COLUMNS are kept
+        cleaned (bool): df is already cleaned e.g. read from a snapshot, so
+            it is used as dataframe() without parsing it again
     """
 
-    def __init__(self, channel_ID: str, channel_data=None, df=None):
+    def __init__(
+        self,
+        channel_ID: str,
+        channel_data=None,
+        df=None,
+        cache=None,
+        scheduler=None,
+        keep_raw: bool = False,
+        cleaned: bool = False,
+    ):
         """Construct class."""
         self.channel_ID = channel_ID
         self.channel_data = channel_data
-        self.df = df
+        self.keep_raw = keep_raw
+        self._set_dataframe(df, cleaned=cleaned)
+        self.cache = cache
+        self.scheduler = scheduler
 
         if self.channel_data is None or self.df is None:
-            video_data = YouTubeAPI(channel_ID)
+            video_data = YouTubeAPI(
+                channel_ID, cache=cache, scheduler=scheduler
+            )
             self.channel_data = video_data.get_channel_data()
-            self.df = video_data.get_video_data()
+            self._set_dataframe(video_data.get_video_data(raw=keep_raw))
+
+    @property
+    def df(self) -> pd.core.frame.DataFrame:
+        """Video data with the fields of the response parsed, see
+        dataframe()"""
+        return self._df
+
+    def _set_dataframe(
+        self, df: Optional[pd.core.frame.DataFrame], cleaned: bool = False
+    ) -> None:
+        """
+        Keeps new video data, clearing what was worked out from the last
+
+        :params:
+            df (pandas.core.frame.DataFrame, optional): video data
+            cleaned (bool): df is already cleaned, otherwise it is cleaned
+                here, see _clean_dataframe()
+        """
+        if df is not None and not cleaned:
+            with METRICS.stage("dataframe"):
+                df = self._clean_dataframe(df)
+            METRICS.inc("tubestats_rows_total", len(df), stage="dataframe")
+        self._df = df
+        self._rank_orders: Dict[str, np.ndarray] = {}
+
+    def refresh(self) -> int:
+        """
+        Fetches channel data and the videos uploaded since the last fetch.
+        Neither is read from the cache, which would hide new uploads until
+        the cached responses expire.
+
+        :params: self
+        :return: number of new videos
+        :rtype: int
+        """
+        video_data = YouTubeAPI(
+            self.channel_ID, cache=self.cache, scheduler=self.scheduler
+        )
+        self.channel_data = video_data.get_channel_data(refresh=True)
+        frames = list(
+            video_data.iter_video_frames(previous=self.df, raw=self.keep_raw)
+        )
+        if not frames:
+            return 0
+        # only the new videos are parsed
+        new = self._clean_dataframe(pd.concat(frames, ignore_index=True))
+        df = pd.concat([self.df, new], ignore_index=True)
+        self._set_dataframe(
+            df.sort_values(by="snippet.publishedAt_REFORMATED", kind="stable"),
+            cleaned=True,
+        )
+        return len(new)
 
     def channel_name(self) -> str:
         """
@@ -98,7 +368,9 @@ class YouTubeData:
 
     def raw_dataframe(self) -> pd.core.frame.DataFrame:
         """
-        Return raw data frame of video data for channel
+        Return data frame of video data for channel. With keep_raw it has
+        every field of the response, timestamps and durations as returned
+        too, otherwise it is the same as dataframe().
 
         :params: self
         :return: raw_df
@@ -109,49 +381,67 @@ class YouTubeData:
 
     def dataframe(self) -> pd.core.frame.DataFrame:
         """
-        Returns dataframe with relevant columns and altering the datatypes
+        Returns dataframe with relevant columns and altering the datatypes.
+        Built once when the video data is set and shared between calls, so
+        it must not be modified.
 
         :params: self
         :return: df
         :rtype: pandas.core.frame.DataFrame
         """
-        # TODO: Check performance
+        return self.df
 
-        df = self.df
-        df = df[
-            [
-                "snippet.publishedAt",
-                "snippet.title",
-                "id",
-                "snippet.description",
-                "contentDetails.duration",
-                "statistics.viewCount",
-                "statistics.likeCount",
-                "statistics.favoriteCount",
-                "statistics.commentCount",
-            ]
-        ]
+    def data_version(self) -> Tuple[int, str]:
+        """
+        Identifies the video data, changing when videos are added e.g. by
+        refresh(), so what is worked out from it can be keyed by it
 
-        # turns nan into 0s
-        df = df.fillna(0)
+        :params: self
+        :return: number of videos and when the latest was published
+        :rtype: tuple
+        """
+        published_at = self.df["snippet.publishedAt_REFORMATED"]
+        return len(published_at), str(published_at.max())
 
-        # changing dtypes
-        df = df.astype(
-            {
-                "statistics.viewCount": "int",
-                "statistics.likeCount": "int",
-                "statistics.commentCount": "int",
-            }
+    def _clean_dataframe(
+        self, df: pd.core.frame.DataFrame
+    ) -> pd.core.frame.DataFrame:
+        """
+        Builds dataframe returned by dataframe() from video data as
+        returned by the API. Timestamps and durations are replaced by their
+        parsed columns, the strings are only kept alongside if keep_raw.
+
+        :params:
+            df (pandas.core.frame.DataFrame): video data
+        :return: df
+        :rtype: pandas.core.frame.DataFrame
+        """
+        if self.keep_raw:
+            df = df.reindex(
+                columns=df.columns.union(VIDEO_COLUMNS, sort=False)
+            )
+        else:
+            df = prune_video_data(df)
+        published_at = df["snippet.publishedAt"]
+        durations = df["contentDetails.duration"]
+        df = df.drop(
+            columns=["snippet.publishedAt", "contentDetails.duration"]
         )
 
+        # turns nan into 0s, and empty text
+        df = df.fillna({column: 0 for column in COUNT_DTYPES}).fillna("")
+
+        # changing dtypes
+        df = df.astype(COUNT_DTYPES)
+        if self.keep_raw:
+            df["snippet.publishedAt"] = published_at
+            df["contentDetails.duration"] = durations
+
         # reformatting time data
-        # Turning ISO8061 into duation that python can utilise
-        df["snippet.publishedAt_REFORMATED"] = df["snippet.publishedAt"].apply(
-            lambda x: datetime.strptime(x, "%Y-%m-%dT%H:%M:%SZ")
-        )
-        df["contentDetails.duration_REFORMATED"] = df[
-            "contentDetails.duration"
-        ].apply(lambda x: isodate.parse_duration(x))
+        # Turning ISO8061 into duation that python can utilise, missing
+        # durations are left as nan and parsed as zero
+        df["snippet.publishedAt_REFORMATED"] = parse_published_at(published_at)
+        df["contentDetails.duration_REFORMATED"] = parse_durations(durations)
         # sorting data by time
         df = df.sort_values(
             by="snippet.publishedAt_REFORMATED", ascending=True
@@ -180,7 +470,7 @@ class YouTubeData:
         """
         df = self.dataframe()
         watchtime_total = df["contentDetails.duration_REFORMATED"].sum()
-        return watchtime_total
+        return watchtime_total.to_pytimedelta()
 
     def total_comments(self) -> int:
         """
@@ -198,7 +488,9 @@ class YouTubeData:
         self, date_start: datetime, date_end: datetime
     ) -> pd.core.frame.DataFrame:
         """
-        Constrains video between two dates
+        Constrains video between two dates. The dataframe is sorted by
+        upload date, so the range is found by binary search and returned as
+        a slice of dataframe(), which must not be modified.
 
         :params: self
             date_start: (datetime)
@@ -206,48 +498,107 @@ class YouTubeData:
         :return: df
         :rtype: pandas.core.frame.DataFrame
         """
+        start, end = self._window(date_start, date_end)
+        return self.dataframe().iloc[start:end]
+
+    def _window(
+        self, date_start: Optional[datetime], date_end: Optional[datetime]
+    ) -> Tuple[int, int]:
+        """Positions in dataframe() of the first video and after the last"""
+        published = self.dataframe()["snippet.publishedAt_REFORMATED"]
+        published = published.to_numpy()
+        start, end = 0, len(published)
+        if date_start is not None:
+            start = published.searchsorted(np.datetime64(date_start))
+        if date_end is not None:
+            end = published.searchsorted(np.datetime64(date_end))
+        return start, max(start, end)
+
+    def top_videos(
+        self,
+        column: str = "statistics.viewCount",
+        num: int = 10,
+        date_start: Optional[datetime] = None,
+        date_end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.core.frame.DataFrame:
+        """
+        Returns videos with the largest values of a column, between two
+        dates if given. The order of every video is worked out once per
+        column, so asking again over other dates does not rank again.
+
+        :params: self
+            column (str): column of dataframe() ranked by
+            num (int): default is 10
+            date_start (datetime, optional)
+            date_end (datetime, optional)
+            columns (list, optional): columns returned, all if not given
+        :return: df
+        :rtype: pandas.core.frame.DataFrame
+        """
         df = self.dataframe()
-        df = df[
-            (df["snippet.publishedAt_REFORMATED"] >= date_start)
-            & (df["snippet.publishedAt_REFORMATED"] < date_end)
-        ]
-        return df
+        if column not in self._rank_orders:
+            self._rank_orders[column] = rank_order(df[column].to_numpy())
+        start, end = self._window(date_start, date_end)
+        positions = first_in_window(
+            self._rank_orders[column], start, end, int(num)
+        )
+        if columns is not None:
+            df = df[columns]
+        return df.take(positions)
 
     def scatter_all_videos(
-        self, df: pd.core.frame.DataFrame
-    ) -> alt.vegalite.v4.Chart:
+        self, df: pd.core.frame.DataFrame, max_rows: int = CHART_MAX_ROWS
+    ) -> "alt.vegalite.v4.Chart":
         """
         Produces graph plotting natural log of views over
 
         :params: self
             df: (dataframe)
+            max_rows (int): videos plotted, past this the most viewed in
+                each period are plotted, see downsample()
         :return: c (altair.vegalite.v4.Chart)
         """
-        df_views = df
+        import altair as alt
+
+        # only plotted columns are sent to the browser
+        df_views = downsample(
+            df,
+            "snippet.publishedAt_REFORMATED",
+            "statistics.viewCount",
+            max_rows=max_rows,
+        )[
+            [
+                "snippet.publishedAt_REFORMATED",
+                "snippet.title",
+                "statistics.viewCount",
+                "statistics.likeCount",
+            ]
+        ]
         c = (
             alt.Chart(df_views, title="Plot of videos over time")
             .mark_point()
             .encode(
                 x=alt.X(
-                    "snippet\.publishedAt_REFORMATED:T",
+                    r"snippet\.publishedAt_REFORMATED:T",
                     axis=alt.Axis(title="Date Published"),
                 ),
                 y=alt.Y(
-                    "statistics\.viewCount:Q",
+                    r"statistics\.viewCount:Q",
                     axis=alt.Axis(title="View Count"),
                     scale=alt.Scale(type="log"),
                 ),
                 color=alt.Color(
-                    "statistics\.likeCount:Q",
+                    r"statistics\.likeCount:Q",
                     scale=alt.Scale(scheme="turbo"),
                     legend=None,
                 ),
                 tooltip=[
-                    "snippet\.title:N",
-                    "statistics\.viewCount:Q",
-                    "statistics\.likeCount:Q",
+                    r"snippet\.title:N",
+                    r"statistics\.viewCount:Q",
+                    r"statistics\.likeCount:Q",
                 ],
-                size=alt.Size("statistics\.viewCount:Q", legend=None),
+                size=alt.Size(r"statistics\.viewCount:Q", legend=None),
             )
         )
         return c
@@ -266,20 +617,18 @@ class YouTubeData:
             'title' (str): video titles
             'link' (str): url links to video
         """
-        # sort df and then keep relevant tags
-        sorted_df = df.sort_values(by="statistics.viewCount", ascending=False)
-        title = list(sorted_df["snippet.title"].values[0:num])
-        link = list(sorted_df["id"].values[0:num])
-        preserved_df = sorted_df[
-            [
-                "snippet.title",
-                "statistics.viewCount",
-            ]
-        ].head(int(num))
+        most_viewed = top_k(
+            df,
+            "statistics.viewCount",
+            num,
+            columns=["snippet.title", "statistics.viewCount", "id"],
+        )
         most_viewed_info = dict(
-            preserved_df=preserved_df,
-            title=title,
-            link=link,
+            preserved_df=most_viewed[
+                ["snippet.title", "statistics.viewCount"]
+            ],
+            title=list(most_viewed["snippet.title"]),
+            link=list(most_viewed["id"]),
         )
         return most_viewed_info
 
@@ -290,29 +639,15 @@ class YouTubeData:
         Works out time difference between videos
 
         :params: self
-            df (pandas.core.frame.DataFrame): video information
-        :return: dataframe with time difference
+            df (pandas.core.frame.DataFrame): video information, oldest first
+        :return: dataframe with time difference in days
         :rtype: pandas.core.frame.DataFrame
         """
-        video_dates = dict(zip(df.index, df["snippet.publishedAt_REFORMATED"]))
-        video_diff = (
-            video_dates.copy()
-        )  # duplicating dict .copy() so memory isn't referenced
-
-        for i in video_dates.keys():
-            if i == max(list(video_dates.keys())):
-                td = video_dates[i] - video_dates[i]
-            else:
-                td = video_dates[i] - video_dates[i + 1]
-
-            video_diff[i] = td.days + (td.seconds / 60 / 60 / 24)
-
-        td_df = pd.DataFrame(
-            data=video_diff.values(),
-            index=video_diff.keys(),
-            columns=["snippet.time_diff"],
-        )
-        new_df = pd.concat([df, td_df], axis=1)
+        # days from the previous video by position, first video has none
+        time_diff = df["snippet.publishedAt_REFORMATED"].diff().fillna(
+            pd.Timedelta(0)
+        ).dt.total_seconds() / (24 * 60 * 60)
+        new_df = df.assign(**{"snippet.time_diff": time_diff})
         return new_df
 
     def list_time_difference_ranked(
@@ -325,37 +660,48 @@ class YouTubeData:
         :return: time_differences
         :rtype: pandas.core.frame.DataFrame
         """
-        time_differences = df.sort_values(
-            by="snippet.time_diff", ascending=False
-        )[
-            [
+        time_differences = top_k(
+            df,
+            "snippet.time_diff",
+            num,
+            columns=[
                 "snippet.time_diff",
                 "snippet.publishedAt_REFORMATED",
                 "snippet.title",
                 "id",
-            ]
-        ].head(
-            int(num)
+            ],
         )
         return time_differences
 
     def time_difference_plot(
-        self, df: pd.core.frame.DataFrame
-    ) -> alt.vegalite.v4.Chart:
+        self, df: pd.core.frame.DataFrame, max_rows: int = CHART_MAX_ROWS
+    ) -> "alt.vegalite.v4.Chart":
         """
         Provides a 'dotplot' of videos based on length of time from previous video
 
         :params: self
             df (pandas.core.frame.DataFrame)
+            max_rows (int): videos plotted, past this the longest gaps in
+                each period are plotted, see downsample()
         :return:
             c - graph
         :rtype: altair.vegalite.v4.Chart
         """
+        import altair as alt
+
+        df_time = downsample(
+            df,
+            "snippet.publishedAt_REFORMATED",
+            "snippet.time_diff",
+            max_rows=max_rows,
+        )
+        # only plotted columns are sent to the browser, with the jitter
+        # worked out here rather than by the browser
+        df_time = df_time[
+            ["snippet.time_diff", "snippet.title", "statistics.viewCount"]
+        ].assign(jitter=np.random.default_rng(0).standard_normal(len(df_time)))
         c = (
-            alt.Chart(
-                df,
-                title="Time Difference",
-            )
+            alt.Chart(df_time, title="Time Difference")
             .mark_circle()
             .encode(
                 y=alt.Y(
@@ -367,13 +713,10 @@ class YouTubeData:
                     scale=alt.Scale(),
                 ),
                 x=alt.X(
-                    "snippet\.time_diff:Q", title="Day from previous video"
+                    r"snippet\.time_diff:Q", title="Day from previous video"
                 ),
-                color=alt.Color("statistics\.viewCount:Q", legend=None),
-                tooltip=["snippet\.title:N", "statistics\.viewCount:Q"],
-            )
-            .transform_calculate(
-                jitter="sqrt(-2*log(random()))*cos(2*PI*random())"
+                color=alt.Color(r"statistics\.viewCount:Q", legend=None),
+                tooltip=[r"snippet\.title:N", r"statistics\.viewCount:Q"],
             )
             .configure_facet(spacing=0)
             .configure_view(stroke=None)
@@ -403,19 +746,20 @@ class YouTubeData:
         Provides the video id with the greatest time difference, the previous and the next video as a dict
 
         :params: self
-            df (pandas.core.frame.DataFrame) - df ordered by index, time differences and with dates slected
+            df (pandas.core.frame.DataFrame) - df oldest first, with time differences and dates selected
         :return: vid_list with keys:
             'greatest' - id with greatest time diff
             'prev' - id previous
             '_next' - id next
         :rtype: Dict[str, str]
         """
-        # video with greatest difference
-        # multply by -1 because dataframe is reversed
+        # video with greatest difference, neighbours found by position
+        greatest = int(np.argmax(df["snippet.time_diff"].to_numpy()))
+        ids = df["id"].to_numpy()
         vid_list = dict(
-            greatest=df.iloc[df["snippet.time_diff"].idxmax() * -1]["id"],
-            prev=df.iloc[df["snippet.time_diff"].idxmax() * -1 + 1]["id"],
-            _next=df.iloc[df["snippet.time_diff"].idxmax() * -1 - 1]["id"],
+            greatest=ids[greatest],
+            prev=ids[max(greatest - 1, 0)],
+            _next=ids[min(greatest + 1, len(ids) - 1)],
         )
         return vid_list
 
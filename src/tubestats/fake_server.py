@@ -0,0 +1,362 @@
+#!usr/bin/env python3
+# tubestats/fake_server.py - local stand-in for the YouTube Data API
+#                          - serves channels, playlistItems and videos
+#                          - from recorded or synthetic channels
+#                          - injects latency, jitter, quota and server errors
+#
+# by Shivan Sivakumaran
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from tubestats.synthetic import synthetic_channel
+
+API_PATH = "/youtube/v3/"
+
+
+def _error(code: int, reason: str, message: str) -> Dict:
+    return {
+        "error": {
+            "code": code,
+            "message": message,
+            "errors": [{"reason": reason, "message": message}],
+        }
+    }
+
+
+class FakeYouTubeAPI:
+    """
+    Answers list requests like the YouTube Data API, ignoring part and
+    fields so every field of the stored resources is returned
+
+    :params:
+        latency (float): seconds before each response
+        jitter (float): standard deviation of the latency, in seconds
+        quota_error_rate (float): chance a request fails with 403
+            quotaExceeded
+        server_error_rate (float): chance a request fails with 500 or 503
+        quota (int, optional): requests answered before every request
+            fails with 403 quotaExceeded, unlimited if not given
+        seed (int, optional): seed of latency and faults
+    :methods:
+        add_channel(): serves a channel and its videos
+        upload(): adds new uploads to a channel
+        add_recorded(): serves a channel saved as JSON
+        add_synthetic(): serves synthetic channels
+        handle(): answers a request
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        quota_error_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        quota: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self.server_error_rate = server_error_rate
+        self.quota = quota
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.channels: Dict[str, Dict] = {}
+        self.usernames: Dict[str, str] = {}
+        self.playlists: Dict[str, List[Dict]] = {}
+        self.videos: Dict[str, Dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[int, int] = {}
+
+    def add_channel(
+        self, channel: Dict, videos: List[Dict], username: Optional[str] = None
+    ) -> str:
+        """
+        Serves a channel and its videos
+
+        :params:
+            channel (dict): channel resource
+            videos (list): video resources, newest first
+            username (str, optional): legacy username of the channel
+        :return: channel_ID
+        :rtype: str
+        """
+        channel_ID = channel["id"]
+        uploads = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+        self.channels[channel_ID] = channel
+        if username is not None:
+            self.usernames[username] = channel_ID
+        self.playlists[uploads] = videos
+        for video in videos:
+            video.setdefault("snippet", {})["channelId"] = channel_ID
+            self.videos[video["id"]] = video
+        return channel_ID
+
+    def upload(self, channel_ID: str, videos: List[Dict]) -> None:
+        """
+        Adds videos to the front of a channel's uploads, as new uploads
+
+        :params:
+            channel_ID (str)
+            videos (list): video resources, newest first
+        """
+        channel = self.channels[channel_ID]
+        uploads = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+        for video in videos:
+            video.setdefault("snippet", {})["channelId"] = channel_ID
+            self.videos[video["id"]] = video
+        with self._lock:
+            self.playlists[uploads] = videos + self.playlists[uploads]
+        statistics = channel.setdefault("statistics", {})
+        statistics["videoCount"] = str(len(self.playlists[uploads]))
+
+    def add_recorded(self, path: str) -> str:
+        """
+        Serves a channel saved as JSON, {"channel": ..., "videos": [...]}
+
+        :params:
+            path (str): JSON file
+        :return: channel_ID
+        :rtype: str
+        """
+        with open(path) as f:
+            recorded = json.load(f)
+        return self.add_channel(
+            recorded["channel"],
+            recorded["videos"],
+            username=recorded.get("username"),
+        )
+
+    def add_synthetic(self, n_channels: int, n_videos: int) -> List[str]:
+        """
+        Serves synthetic channels, see synthetic.synthetic_channel()
+
+        :params:
+            n_channels (int): number of channels
+            n_videos (int): videos per channel
+        :return: channel IDs
+        :rtype: List[str]
+        """
+        return [
+            self.add_channel(
+                *synthetic_channel(n_videos, seed=seed),
+                username=f"synthetic{seed}",
+            )
+            for seed in range(n_channels)
+        ]
+
+    def _fault(self) -> Optional[Tuple[int, Dict]]:
+        with self._lock:
+            answered = sum(self.requests.values())
+            chance = self._random.random()
+            server_error = self._random.choice([500, 503])
+        exhausted = self.quota is not None and answered > self.quota
+        if exhausted or chance < self.quota_error_rate:
+            return 403, _error(
+                403,
+                "quotaExceeded",
+                "The request cannot be completed because you have exceeded "
+                "your quota.",
+            )
+        if chance < self.quota_error_rate + self.server_error_rate:
+            return server_error, _error(
+                server_error, "backendError", "Backend Error"
+            )
+        return None
+
+    def _delay(self) -> float:
+        with self._lock:
+            delay = self._random.gauss(self.latency, self.jitter)
+        return max(delay, 0.0)
+
+    def handle(self, endpoint: str, query: Dict[str, str]) -> Tuple[int, Dict]:
+        """
+        Answers a list request, sleeping for the latency first
+
+        :params:
+            endpoint (str): 'channels', 'playlistItems' or 'videos'
+            query (dict): query parameters
+        :return: HTTP status and response
+        :rtype: Tuple[int, dict]
+        """
+        time.sleep(self._delay())
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        status, body = self._fault() or self._respond(endpoint, query)
+        if status != 200:
+            with self._lock:
+                self.errors[status] = self.errors.get(status, 0) + 1
+        return status, body
+
+    def _respond(
+        self, endpoint: str, query: Dict[str, str]
+    ) -> Tuple[int, Dict]:
+        if endpoint == "channels":
+            channel_IDs: List[str] = []
+            if "forUsername" in query:
+                channel_ID = self.usernames.get(query["forUsername"])
+                if channel_ID is not None:
+                    channel_IDs.append(channel_ID)
+            else:
+                channel_IDs = query.get("id", "").split(",")
+            items = [
+                self.channels[i] for i in channel_IDs if i in self.channels
+            ]
+            return 200, {"kind": "youtube#channelListResponse", "items": items}
+
+        if endpoint == "videos":
+            video_IDs = query.get("id", "").split(",")
+            if len(video_IDs) > 50:
+                return 400, _error(400, "tooManyIds", "Too many video IDs")
+            items = [self.videos[i] for i in video_IDs if i in self.videos]
+            return 200, {"kind": "youtube#videoListResponse", "items": items}
+
+        if endpoint == "playlistItems":
+            videos = self.playlists.get(query.get("playlistId", ""))
+            if videos is None:
+                return 404, _error(404, "playlistNotFound", "Not Found")
+            max_results = min(int(query.get("maxResults", 5)), 50)
+            try:
+                start = int(query.get("pageToken", 0))
+            except ValueError:
+                return 400, _error(400, "invalidPageToken", "Bad pageToken")
+            end = start + max_results
+            response = {
+                "kind": "youtube#playlistItemListResponse",
+                "items": [
+                    {
+                        "kind": "youtube#playlistItem",
+                        "contentDetails": {
+                            "videoId": video["id"],
+                            "videoPublishedAt": video["snippet"].get(
+                                "publishedAt"
+                            ),
+                        },
+                    }
+                    for video in videos[start:end]
+                ],
+                "pageInfo": {
+                    "totalResults": len(videos),
+                    "resultsPerPage": max_results,
+                },
+            }
+            if end < len(videos):
+                response["nextPageToken"] = str(end)
+            return 200, response
+
+        return 404, _error(404, "notFound", f"Unknown endpoint {endpoint}")
+
+
+def serve(
+    api: FakeYouTubeAPI, host: str = "127.0.0.1", port: int = 0
+) -> ThreadingHTTPServer:
+    """
+    Serves the stand-in API from a background thread, call shutdown() on
+    the server returned to stop it
+
+    :params:
+        api (FakeYouTubeAPI)
+        host (str)
+        port (int): 0 picks a free port
+    :return: server, its base URL is base_url(server)
+    :rtype: http.server.ThreadingHTTPServer
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith(API_PATH):
+                # repeated parameters e.g. id=a&id=b are read as id=a,b
+                query = {
+                    key: ",".join(values)
+                    for key, values in parse_qs(url.query).items()
+                }
+                status, body = api.handle(url.path[len(API_PATH) :], query)
+            else:
+                status, body = 404, _error(404, "notFound", "Not Found")
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    """
+    Base URL of a server, for create_api() or YT_API_BASE_URL
+
+    :params:
+        server (http.server.ThreadingHTTPServer)
+    :return: base URL
+    :rtype: str
+    """
+    host, port = server.server_address[:2]
+    if isinstance(host, bytes):
+        host = host.decode()
+    return f"http://{host}:{port}/"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the YouTube Data API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--recorded", nargs="*", default=[], help="channels saved as JSON"
+    )
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--quota", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    api = FakeYouTubeAPI(
+        latency=args.latency,
+        jitter=args.jitter,
+        quota_error_rate=args.quota_error_rate,
+        server_error_rate=args.server_error_rate,
+        quota=args.quota,
+        seed=args.seed,
+    )
+    channel_IDs = [api.add_recorded(path) for path in args.recorded]
+    if not args.recorded:
+        channel_IDs = api.add_synthetic(args.channels, args.videos)
+
+    server = serve(api, args.host, args.port)
+    sys.stderr.write(f"Serving on {base_url(server)}\n")
+    for channel_ID in channel_IDs:
+        sys.stdout.write(f"{channel_ID}\n")
+    sys.stdout.flush()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
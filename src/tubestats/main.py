@@ -2,28 +2,156 @@
 import os
 from datetime import datetime, timedelta
 
-import sentry_sdk
 import streamlit as st
-from data import YouTubeData
-
-sentry_sdk.init(
-    dsn=f"https://{os.getenv('SENTRY_DSN', '')}.ingest.sentry.io/6629324",
-    traces_sample_rate=0.1,
-)
+from tubestats.cache import SQLiteCache
+from tubestats.data import CHART_MAX_ROWS, YouTubeData
+from tubestats.metrics import METRICS, serve, transaction
+from tubestats.quota import QuotaScheduler
+from tubestats.warmer import WARM_INTERVAL, CacheWarmer, RequestTracker
 
 # Settings
 ALI_ABDAAL_CHANNEL_ID = "UCoOae5nYA7VqaXzerajD0lg"
 SHIVAN_SIVAKUMARAN_CHANNEL_ID = "UCrbYXWUmeCy4GqArthu4hCw"
 DEBUG = False
 DEFAULT_CHANNEL_ID = SHIVAN_SIVAKUMARAN_CHANNEL_ID
+# videos plotted before charts are downsampled
+CHART_ROWS = int(os.getenv("TUBESTATS_CHART_MAX_ROWS", CHART_MAX_ROWS))
+# seconds fetched channels are kept, and how many
+FETCH_TTL = int(os.getenv("TUBESTATS_FETCH_TTL", "3600"))
+FETCH_MAX_ENTRIES = int(os.getenv("TUBESTATS_FETCH_MAX_ENTRIES", "32"))
+# seconds tables of a date range are kept, and how many
+DERIVED_TTL = int(os.getenv("TUBESTATS_DERIVED_TTL", "600"))
+DERIVED_MAX_ENTRIES = int(os.getenv("TUBESTATS_DERIVED_MAX_ENTRIES", "256"))
+# seconds between cache warming rounds, 0 turns warming off
+WARM_EVERY = float(os.getenv("TUBESTATS_WARM_INTERVAL", WARM_INTERVAL))
+
+
+@st.cache_resource
+def init_sentry():
+    """Errors and traces are sent to sentry when SENTRY_DSN is set"""
+    dsn = os.getenv("SENTRY_DSN")
+    if not dsn:
+        return False
+    import sentry_sdk
+
+    sentry_sdk.init(
+        dsn=f"https://{dsn}.ingest.sentry.io/6629324",
+        traces_sample_rate=0.1,
+    )
+    return True
+
+
+@st.cache_resource
+def get_cache():
+    """API responses persist across restarts and redeploys"""
+    return SQLiteCache(
+        os.getenv("TUBESTATS_CACHE_PATH", "tubestats_cache.sqlite3"),
+        max_entries=int(os.getenv("TUBESTATS_CACHE_MAX_ENTRIES", "10000")),
+        stale_ttl=int(os.getenv("TUBESTATS_CACHE_STALE_TTL", "86400")),
+    )
+
+
+@st.cache_resource
+def get_scheduler():
+    """Quota is shared by every session of the app"""
+    return QuotaScheduler(
+        daily_budget=int(os.getenv("TUBESTATS_DAILY_QUOTA", "10000")),
+        rate=float(os.getenv("TUBESTATS_REQUESTS_PER_SECOND", "10")),
+    )
+
+
+@st.cache_resource
+def get_tracker():
+    """Requests are counted next to the cache, for the warmer"""
+    return RequestTracker(
+        os.getenv("TUBESTATS_CACHE_PATH", "tubestats_cache.sqlite3")
+    )
+
+
+@st.cache_resource
+def cache_warmer():
+    """The default and most requested channels are kept in the cache"""
+    if WARM_EVERY <= 0:
+        return None
+    warmer = CacheWarmer(
+        get_cache(),
+        get_tracker(),
+        scheduler=get_scheduler(),
+        top=int(os.getenv("TUBESTATS_WARM_TOP", "10")),
+        budget=int(os.getenv("TUBESTATS_WARM_BUDGET", "1000")),
+        keep_quota=int(os.getenv("TUBESTATS_WARM_KEEP_QUOTA", "2000")),
+        interval=WARM_EVERY,
+        channels=[DEFAULT_CHANNEL_ID],
+    )
+    warmer.start()
+    return warmer
+
+
+@st.cache_resource
+def metrics_server():
+    """Metrics of every session are served on TUBESTATS_METRICS_PORT"""
+    port = os.getenv("TUBESTATS_METRICS_PORT")
+    if port:
+        return serve(int(port))
+    return None
 
 
-@st.cache
+@st.cache_resource(ttl=FETCH_TTL, max_entries=FETCH_MAX_ENTRIES)
 def fetch_data(user_input):
-    youtuber_data = YouTubeData(user_input)
+    """
+    Channels are shared by every session without copying, so must not be
+    modified. The cleaned dataframe is memoized on it.
+    """
+    youtuber_data = YouTubeData(
+        user_input,
+        cache=get_cache(),
+        scheduler=get_scheduler(),
+        keep_raw=DEBUG,
+    )
     return youtuber_data
 
 
+@st.cache_data(ttl=DERIVED_TTL, max_entries=DERIVED_MAX_ENTRIES)
+def date_range_tables(
+    _youtuber_data, data_version, user_input, date_start, date_end
+):
+    """
+    Tables and chart specs of the videos in a date range, keyed by the
+    input and dates so moving the slider back is not worked out again.
+    The data is not hashed, data_version keys it instead so tables of a
+    channel fetched again are not served from before.
+    """
+    youtuber_data = _youtuber_data
+    with METRICS.stage("transform"):
+        transformed_df = youtuber_data.transform_dataframe(
+            date_start=date_start, date_end=date_end
+        )
+    # serialising the charts once here, not on every rerun
+    with METRICS.stage("chart_scatter"):
+        scatter = youtuber_data.scatter_all_videos(
+            transformed_df, max_rows=CHART_ROWS
+        ).to_dict()
+    with METRICS.stage("time_difference"):
+        time_df = youtuber_data.time_difference_calculate(df=transformed_df)
+        time_diff = youtuber_data.list_time_difference_ranked(df=time_df)
+        quantiles = youtuber_data.time_difference_statistics(df=time_df)
+        vid_list = youtuber_data.greatest_time_difference_video(time_df)
+    with METRICS.stage("chart_time_difference"):
+        time_plot = youtuber_data.time_difference_plot(
+            df=time_df, max_rows=CHART_ROWS
+        ).to_dict()
+    with METRICS.stage("most_viewed"):
+        most_viewed_info = youtuber_data.most_viewed_videos(df=transformed_df)
+    return dict(
+        scatter=scatter,
+        time_diff=time_diff,
+        quantiles=quantiles,
+        vid_list=vid_list,
+        time_plot=time_plot,
+        most_viewed_info=most_viewed_info,
+    )
+
+
 def main():
     """Entry point."""
     """
@@ -42,7 +170,12 @@ def main():
             f"Please input a YouTube channel ID (e.g. {DEFAULT_CHANNEL_ID}) or a link to a YouTube video."
         )
         st.stop()
-    youtuber_data = fetch_data(user_input)
+    with METRICS.stage("fetch"):
+        youtuber_data = fetch_data(user_input)
+    # counting each channel once per session, not on every rerun
+    if st.session_state.get("tracked_input") != user_input:
+        get_tracker().record(user_input)
+        st.session_state["tracked_input"] = user_input
 
     if DEBUG is True:
         raw_df = youtuber_data.raw_dataframe()
@@ -83,6 +216,7 @@ def main():
     - colour represents the like
     - size represents the number of views.
     - a natural log axis is applied to the view count due to its 'viral' nature
+    - for large channels, the most viewed videos of each period are plotted
     """
     first_video_date = (
         df["snippet.publishedAt_REFORMATED"].min().to_pydatetime()
@@ -104,24 +238,23 @@ def main():
         return date_start, date_end
 
     date_start, date_end = date_slider()
-    transformed_df = youtuber_data.transform_dataframe(
-        date_start=date_start, date_end=date_end
+    tables = date_range_tables(
+        youtuber_data,
+        youtuber_data.data_version(),
+        user_input,
+        date_start,
+        date_end,
     )
-    c = youtuber_data.scatter_all_videos(transformed_df)
-    st.altair_chart(c, use_container_width=True)
+    st.vega_lite_chart(tables["scatter"], use_container_width=True)
 
     st.subheader("Videos by Time Difference")
     """
     This looks at the time difference between the current video and the previous video.
     """
-    time_df = youtuber_data.time_difference_calculate(df=transformed_df)
-    time_diff = youtuber_data.list_time_difference_ranked(df=time_df)
-    st.altair_chart(
-        youtuber_data.time_difference_plot(df=time_df),
-        use_container_width=True,
-    )
+    time_diff = tables["time_diff"]
+    st.vega_lite_chart(tables["time_plot"], use_container_width=True)
 
-    quantiles = youtuber_data.time_difference_statistics(df=time_df)
+    quantiles = tables["quantiles"]
     st.subheader("Time Difference Statistics:")
     st.markdown(
         "25th Percentile: `" + "{:0.1f}".format(quantiles[0.25]) + "` days"
@@ -134,7 +267,7 @@ def main():
         "Longest Hiatus: `" + "{:0.1f}".format(quantiles[1.0]) + "` days"
     )
 
-    vid_list = youtuber_data.greatest_time_difference_video(time_df)
+    vid_list = tables["vid_list"]
     st.subheader("Longest Hiatus:")
     st.video("https://www.youtube.com/watch?v=" + str(vid_list["greatest"]))
     prev_col, next_col = st.columns(2)
@@ -167,7 +300,7 @@ def main():
             The content is engaging enough and liked to be \
             recommended and viewed more often to other viewers.
     """
-    most_viewed_info = youtuber_data.most_viewed_videos(df=transformed_df)
+    most_viewed_info = tables["most_viewed_info"]
     st.write(most_viewed_info["preserved_df"])
     display_vid_links(most_viewed_info)
 
@@ -180,9 +313,16 @@ def main():
 
 if __name__ == "__main__":
     st.set_page_config(page_title="TubeStats")
+    init_sentry()
+    metrics_server()
+    cache_warmer()
     if DEBUG == True:
         main()
     try:
-        main()
+        with transaction("main"):
+            main()
     except Exception as e:
         st.error("Error: {e}".format(e=e))
+    finally:
+        if os.getenv("TUBESTATS_METRICS_FILE"):
+            METRICS.write(os.environ["TUBESTATS_METRICS_FILE"])
@@ -0,0 +1,255 @@
+#!usr/bin/env python3
+# tubestats/metrics.py - instruments the stages of fetching and charting
+#                      - times stages, as histograms and tracing spans
+#                      - counts API calls, quota units, pages and rows
+#                      - exports metrics in the Prometheus text format
+#
+# by Shivan Sivakumaran
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Tuple
+
+# upper bounds of the stage duration histogram, in seconds
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HELP = {
+    "tubestats_stage_seconds": "Duration of each stage",
+    "tubestats_api_request_seconds": "Duration of requests to the API",
+    "tubestats_api_calls_total": "Requests sent to the YouTube API",
+    "tubestats_quota_units_total": "Quota units used by requests",
+    "tubestats_pages_total": "Pages of the uploads playlist fetched",
+    "tubestats_rows_total": "Videos processed by each stage",
+    "tubestats_channels_warmed_total": "Channels refreshed by the warmer",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _sentry():
+    """sentry_sdk if it has been imported, e.g. by the app, so headless
+    runs do not pay for importing it"""
+    return sys.modules.get("sentry_sdk")
+
+
+def _span(name: str):
+    """Tracing span of a stage, if sentry is in use"""
+    sentry_sdk = _sentry()
+    if sentry_sdk is None:
+        return nullcontext()
+    return sentry_sdk.start_span(op="tubestats.stage", description=name)
+
+
+def transaction(name: str):
+    """
+    Tracing transaction that stage spans belong to, if sentry is in use
+
+    :params:
+        name (str): e.g. 'main'
+    :return: context manager
+    """
+    sentry_sdk = _sentry()
+    if sentry_sdk is None:
+        return nullcontext()
+    return sentry_sdk.start_transaction(op="tubestats", name=name)
+
+
+def _render_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metrics:
+    """
+    Counters and stage duration histograms shared between threads
+
+    :params:
+        buckets (tuple): upper bounds of the duration histogram, in seconds
+    :methods:
+        inc(): adds to a counter
+        observe(): records a duration
+        stage(): times a block as a stage
+        value(): reads a counter
+        render(): metrics in the Prometheus text format
+        write(): writes render() to a file
+        reset(): clears every metric
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter
+
+        :params:
+            name (str): e.g. 'tubestats_api_calls_total'
+            value (float)
+            **labels: e.g. endpoint='videos'
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """
+        Records a duration in a histogram
+
+        :params:
+            name (str): e.g. 'tubestats_stage_seconds'
+            seconds (float)
+            **labels: e.g. stage='dataframe'
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            # counts per bucket, then count and sum of every observation
+            observed = histogram.setdefault(
+                key, [[0] * len(self.buckets), 0, 0.0]
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    observed[0][i] += 1
+            observed[1] += 1
+            observed[2] += seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times a block as tubestats_stage_seconds{stage=name}, within a
+        tracing span
+
+        :params:
+            name (str): e.g. 'resolve_channel'
+        """
+        start = time.perf_counter()
+        with _span(name):
+            try:
+                yield
+            finally:
+                self.observe(
+                    "tubestats_stage_seconds",
+                    time.perf_counter() - start,
+                    stage=name,
+                )
+
+    def value(self, name: str, **labels: str) -> float:
+        """
+        Reads a counter, or the count of a histogram
+
+        :params:
+            name (str)
+            **labels
+        :return: value, 0 if never recorded
+        :rtype: float
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if name in self._histograms:
+                return self._histograms[name].get(key, [None, 0])[1]
+            return self._counters.get(name, {}).get(key, 0)
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text format
+
+        :return: metrics
+        :rtype: str
+        """
+        lines = []
+        with self._lock:
+            for name, counter in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(counter.items()):
+                    lines.append(f"{name}{_render_labels(labels)} {value:g}")
+            for name, histogram in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, (buckets, count, total) in sorted(
+                    histogram.items()
+                ):
+                    for bound, n in zip(self.buckets, buckets):
+                        le = labels + (("le", f"{bound:g}"),)
+                        lines.append(f"{name}_bucket{_render_labels(le)} {n}")
+                    le = labels + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_render_labels(le)} {count}")
+                    lines.append(f"{name}_sum{_render_labels(labels)} {total}")
+                    lines.append(
+                        f"{name}_count{_render_labels(labels)} {count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes render() to a file, replacing it whole so a scraper never
+        reads half a file e.g. for the node exporter's textfile collector
+
+        :params:
+            path (str)
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, suffix=".tmp", delete=False
+        ) as f:
+            f.write(self.render())
+        os.replace(f.name, path)
+
+    def reset(self) -> None:
+        """Clears every metric"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# metrics of the process, recorded by the API client and YouTubeData
+METRICS = Metrics()
+
+
+def serve(
+    port: int, host: str = "0.0.0.0", metrics: Metrics = METRICS
+) -> ThreadingHTTPServer:
+    """
+    Serves metrics at /metrics from a background thread
+
+    :params:
+        port (int): 0 picks a free port
+        host (str)
+        metrics (Metrics)
+    :return: server, call shutdown() to stop it
+    :rtype: http.server.ThreadingHTTPServer
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            content = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
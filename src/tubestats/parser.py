@@ -3,59 +3,235 @@
 #
 # by Shivan Sivakumaran
 
+import os
 import re
-from typing import Sequence
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import googleapiclient
 
+from tubestats.cache import ResponseCache, SQLiteCache
+from tubestats.metrics import METRICS
+from tubestats.pool import HTTP_POOL, HttpPool
+from tubestats.quota import QUOTA_COSTS
+from tubestats.schema import request_fields
 
-def channel_parser(
-    youtube: googleapiclient.discovery.Resource, for_parse: str
-) -> Sequence[str]:
+LINK_MATCH = r"(^.*youtu)(\.be|be\.com)(\/watch\?v\=|\/)([a-zA-Z0-9_-]+)(\/)?([a-zA-Z0-9_-]+)?"
+LINK_PATTERN = re.compile(LINK_MATCH)
+
+# video IDs in one videos().list request, the API limit
+VIDEOS_PER_REQUEST = 50
+
+# lookups of the process, shared by resolvers not given a cache
+_LOOKUP_CACHE: Optional[SQLiteCache] = None
+_LOOKUP_LOCK = threading.Lock()
+
+
+def lookup_cache() -> SQLiteCache:
     """
-    Parses user input from link to produce a channel ID
+    In memory cache of lookups shared by the process, created on first use
+
+    :return: cache
+    :rtype: SQLiteCache
+    """
+    global _LOOKUP_CACHE
+    with _LOOKUP_LOCK:
+        if _LOOKUP_CACHE is None:
+            _LOOKUP_CACHE = SQLiteCache()
+        return _LOOKUP_CACHE
+
+
+def _after_fork_in_child() -> None:
+    # a SQLite connection must not be used across a fork
+    global _LOOKUP_CACHE, _LOOKUP_LOCK
+    _LOOKUP_CACHE = None
+    _LOOKUP_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def parse_input(for_parse: str) -> Tuple[str, str]:
+    """
+    Works out what the user input refers to, without calling the API
 
     params:
-        youtube (googleapiclient.discovery)
         for_parse (str)
-    :returns: channel_ID
-    :rtype: str
+    :returns: kind of input, either 'video', 'channel' or 'user', and its ID
+        or username
+    :rtype: Tuple[str, str]
     """
     if len(for_parse) == 11:
         # video ID is 11 char long
-        request = youtube.videos().list(
-            part="snippet",
-            id=for_parse,
-        )
-        response = request.execute()
-        channel_ID = response["items"][0]["snippet"]["channelId"]
-        return channel_ID
+        return "video", for_parse
     elif len(for_parse) == 24:
         # channel ID is 24 char long
-        return for_parse
+        return "channel", for_parse
     else:
-        LINK_MATCH = r"(^.*youtu)(\.be|be\.com)(\/watch\?v\=|\/)([a-zA-Z0-9_-]+)(\/)?([a-zA-Z0-9_-]+)?"
-        m = re.search(LINK_MATCH, for_parse)
-        video_id = m.group(4)  # type: ignore
+        m = LINK_PATTERN.search(for_parse)
+        if m is None:
+            raise ValueError(f"Not a channel ID or YouTube link: {for_parse}")
+        video_id = m.group(4)
         if video_id == "channel":
-            return m.group(6)  # type: ignore
+            return "channel", m.group(6)
         elif video_id == "user":
-            channel_username = m.group(6)  # type: ignore
-            request = youtube.channels().list(
-                part="snippet",
-                forUsername=channel_username,
-            )
-            response = request.execute()
-            channel_ID = response["items"][0]["id"]
-            return channel_ID
+            return "user", m.group(6)
         else:
-            request = youtube.videos().list(
+            return "video", video_id
+
+
+class ChannelResolver:
+    """
+    Maps user inputs to channel IDs. Video and username lookups are kept in
+    an LRU cache, as the channel of a video never changes, and video IDs are
+    looked up 50 to a request.
+
+    :params:
+        youtube (googleapiclient.discovery.Resource)
+        cache (ResponseCache, optional): stores lookups, a SQLiteCache file
+            keeps them across restarts. Defaults to lookup_cache(), in
+            memory and shared by the process.
+        scheduler (QuotaScheduler, optional): accounts for quota used
+        pool (HttpPool, optional): HTTP clients, defaults to HTTP_POOL
+    :methods:
+        resolve(): returns channel ID of an input
+        resolve_many(): returns channel IDs of many inputs
+    """
+
+    def __init__(
+        self,
+        youtube: googleapiclient.discovery.Resource,
+        cache: Optional[ResponseCache] = None,
+        scheduler=None,
+        pool: Optional[HttpPool] = None,
+    ):
+        self.youtube = youtube
+        self.cache = lookup_cache() if cache is None else cache
+        self.scheduler = scheduler
+        self.pool = HTTP_POOL if pool is None else pool
+
+    def _execute(self, endpoint: str, **params) -> Dict:
+        costs = QUOTA_COSTS
+        if self.scheduler is not None:
+            self.scheduler.acquire(endpoint)
+            costs = self.scheduler.costs
+        METRICS.inc("tubestats_api_calls_total", endpoint=endpoint)
+        METRICS.inc(
+            "tubestats_quota_units_total", costs[endpoint], endpoint=endpoint
+        )
+        return self.pool.execute(
+            getattr(self.youtube, endpoint)().list(**params)
+        )
+
+    def _lookup(self, kind: str, value: str) -> Optional[str]:
+        entry = self.cache.get(f"{kind}_channel:{value}")
+        return None if entry is None else entry[0]["channel_ID"]
+
+    def _store(self, kind: str, value: str, channel_ID: str) -> None:
+        self.cache.set(f"{kind}_channel:{value}", {"channel_ID": channel_ID})
+
+    def _resolve_videos(self, video_IDs: List[str]) -> None:
+        for i in range(0, len(video_IDs), VIDEOS_PER_REQUEST):
+            response = self._execute(
+                "videos",
                 part="snippet",
-                id=video_id,
+                id=video_IDs[i : i + VIDEOS_PER_REQUEST],
+                fields=request_fields("video_channel"),
             )
-            response = request.execute()
-            channel_ID = response["items"][0]["snippet"]["channelId"]
-            return channel_ID
+            for item in response.get("items", []):
+                self._store("video", item["id"], item["snippet"]["channelId"])
+
+    def _resolve_user(self, username: str) -> None:
+        response = self._execute(
+            "channels",
+            part="id",
+            forUsername=username,
+            fields=request_fields("username_channel"),
+        )
+        items = response.get("items", [])
+        if items:
+            self._store("user", username, items[0]["id"])
+
+    def resolve_many(self, inputs: Iterable[str]) -> List[Optional[str]]:
+        """
+        Maps many user inputs to channel IDs, with one videos().list
+        request per 50 video IDs not already cached
+
+        :params:
+            inputs (iterable): channel IDs, video IDs, links or usernames
+        :return: channel IDs in the order of inputs, None for inputs that
+            are not valid or not found e.g. deleted videos
+        :rtype: List[Optional[str]]
+        """
+        parsed: List[Optional[Tuple[str, str]]] = []
+        for for_parse in inputs:
+            try:
+                parsed.append(parse_input(for_parse))
+            except ValueError:
+                parsed.append(None)
+
+        # kind and value of inputs not cached, in order without repeats
+        missing = {
+            (kind, value): None
+            for kind, value in filter(None, parsed)
+            if kind != "channel" and self._lookup(kind, value) is None
+        }
+        self._resolve_videos(
+            [value for kind, value in missing if kind == "video"]
+        )
+        for kind, value in missing:
+            if kind == "user":
+                self._resolve_user(value)
+
+        channel_IDs: List[Optional[str]] = []
+        for parsed_input in parsed:
+            if parsed_input is None:
+                channel_IDs.append(None)
+            elif parsed_input[0] == "channel":
+                channel_IDs.append(parsed_input[1])
+            else:
+                channel_IDs.append(self._lookup(*parsed_input))
+        return channel_IDs
+
+    def resolve(self, for_parse: str) -> str:
+        """
+        Maps a user input to a channel ID
+
+        :params:
+            for_parse (str): channel ID, video ID, link or username
+        :return: channel_ID
+        :rtype: str
+        """
+        channel_ID = self.resolve_many([for_parse])[0]
+        if channel_ID is None:
+            raise ValueError(f"No channel found for {for_parse}")
+        return channel_ID
+
+
+def channel_parser(
+    youtube: googleapiclient.discovery.Resource,
+    for_parse: str,
+    scheduler=None,
+    cache: Optional[ResponseCache] = None,
+    pool: Optional[HttpPool] = None,
+) -> Sequence[str]:
+    """
+    Parses user input from link to produce a channel ID
+
+    params:
+        youtube (googleapiclient.discovery)
+        for_parse (str)
+        scheduler (QuotaScheduler, optional): accounts for quota used
+        cache (ResponseCache, optional): stores lookups, see ChannelResolver
+        pool (HttpPool, optional): HTTP clients, defaults to HTTP_POOL
+    :returns: channel_ID
+    :rtype: str
+    """
+    resolver = ChannelResolver(
+        youtube, cache=cache, scheduler=scheduler, pool=pool
+    )
+    return resolver.resolve(for_parse)
 
 
 def main():
@@ -0,0 +1,124 @@
+#!usr/bin/env python3
+# tubestats/pool.py - keep-alive HTTP connections shared between threads
+#                   - lends each connection to one thread at a time
+#                   - reused across channels, so handshakes are paid once
+#                   - emptied in forked children, which must not share sockets
+#
+# by Shivan Sivakumaran
+
+import logging
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import googleapiclient.http
+import httplib2
+
+# pools of the process, emptied in children e.g. batch workers
+_POOLS: "weakref.WeakSet[HttpPool]" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for pool in list(_POOLS):
+        pool._after_fork()
+
+
+class HttpPool:
+    """
+    Pool of HTTP clients for API requests. httplib2.Http is not thread safe,
+    so each client is lent to one thread at a time, and keeps its
+    connections open between requests.
+
+    :params:
+        max_idle (int): clients kept open when not lent, more are closed
+        factory (callable, optional): creates a client, defaults to
+            googleapiclient.http.build_http
+    :methods:
+        connection(): lends a client
+        execute(): executes a request on a lent client
+        close(): closes clients not lent
+    """
+
+    def __init__(
+        self,
+        max_idle: int = 16,
+        factory: Optional[Callable[[], httplib2.Http]] = None,
+    ):
+        self.max_idle = max_idle
+        self.factory = factory or googleapiclient.http.build_http
+        # clients created over the life of the pool
+        self.created = 0
+        self._lock = threading.Lock()
+        self._idle: List[httplib2.Http] = []
+        _POOLS.add(self)
+
+    @contextmanager
+    def connection(self) -> Iterator[httplib2.Http]:
+        """
+        Lends a client, returned to the pool afterwards. A client that
+        raised is closed, as its connection may be left half read.
+
+        :return: client
+        :rtype: httplib2.Http
+        """
+        with self._lock:
+            http = self._idle.pop() if self._idle else None
+            if http is None:
+                self.created += 1
+        if http is None:
+            http = self.factory()
+        try:
+            yield http
+        except BaseException:
+            self._close(http)
+            raise
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(http)
+                return
+        self._close(http)
+
+    def execute(self, request: googleapiclient.http.HttpRequest) -> Dict:
+        """
+        Executes a request on a client from the pool
+
+        :params:
+            request (googleapiclient.http.HttpRequest): e.g. from list()
+        :return: response
+        :rtype: dict
+        """
+        with self.connection() as http:
+            return request.execute(http=http)
+
+    def close(self) -> None:
+        """Closes clients not lent"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            self._close(http)
+
+    def _after_fork(self) -> None:
+        """Forgets clients inherited from the parent without closing them,
+        as their sockets are still the parent's"""
+        self._lock = threading.Lock()
+        self._idle = []
+
+    @staticmethod
+    def _close(http: httplib2.Http) -> None:
+        try:
+            http.close()
+        except Exception:
+            logging.error("Error on closing HTTP client", exc_info=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+
+# clients of the process, shared by YouTubeAPI and ChannelResolver
+HTTP_POOL = HttpPool()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,199 @@
+#!usr/bin/env python3
+# tubestats/quota.py - schedules YouTube API requests within quota
+#                    - knows the quota cost of each endpoint
+#                    - enforces a daily budget and a token-bucket rate limit
+#
+# by Shivan Sivakumaran
+
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+# quota units per request, by endpoint
+QUOTA_COSTS = {
+    "channels": 1,
+    "playlistItems": 1,
+    "videos": 1,
+    "search": 100,
+}
+DAILY_QUOTA = 10000
+# quota resets at midnight Pacific Time, UTC-8 taken as standard time
+QUOTA_RESET_UTC_OFFSET = timedelta(hours=-8)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a request would exceed the daily quota budget"""
+
+
+def channel_cost(video_count: int) -> int:
+    """
+    Estimates the quota units to fetch a channel's videos with YouTubeAPI
+
+    :params:
+        video_count (int): videos uploaded on the channel
+    :return: units, a playlistItems and a videos request per 50 videos
+    :rtype: int
+    """
+    pages = max(math.ceil(video_count / 50), 1)
+    return pages * (QUOTA_COSTS["playlistItems"] + QUOTA_COSTS["videos"])
+
+
+class Reservation:
+    """
+    Units set aside for one fetch, returned by QuotaScheduler.reserve() and
+    passed to acquire() for the fetch's requests
+
+    :params:
+        units (int): units left
+        day (date): quota day the units were reserved on, they lapse with
+            it as the budget is reset
+    """
+
+    def __init__(self, units: int, day: date):
+        self.units = units
+        self.day = day
+
+
+class QuotaScheduler:
+    """
+    Accounts for quota used by requests, shared between API clients
+
+    :params:
+        daily_budget (int): units that can be used per day
+        rate (float): requests per second allowed on average
+        burst (int): requests allowed at once above the rate
+        costs (dict, optional): units by endpoint, added to QUOTA_COSTS
+    :methods:
+        acquire(): waits for, and records, a request to an endpoint
+        reserve(): sets aside units for a fetch before it starts
+        release(): returns units of a reservation not used
+        can_afford(): whether units fit in what remains of the budget
+        remaining(): units left today
+    """
+
+    def __init__(
+        self,
+        daily_budget: int = DAILY_QUOTA,
+        rate: float = 10.0,
+        burst: int = 10,
+        costs: Optional[Dict[str, int]] = None,
+    ):
+        self.daily_budget = daily_budget
+        self.rate = rate
+        self.burst = burst
+        self.costs = dict(QUOTA_COSTS, **(costs or {}))
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._day = self._quota_day()
+        self._used = 0
+        self._reserved = 0
+
+    @staticmethod
+    def _quota_day():
+        return (datetime.now(timezone.utc) + QUOTA_RESET_UTC_OFFSET).date()
+
+    def _reset_if_new_day(self) -> None:
+        day = self._quota_day()
+        if day != self._day:
+            self._day = day
+            self._used = 0
+            self._reserved = 0
+
+    def _held(self, reservation: Optional[Reservation]) -> int:
+        """Units of a reservation still held, none if reserved on an
+        earlier day"""
+        if reservation is None or reservation.day != self._day:
+            return 0
+        return reservation.units
+
+    def remaining(self) -> int:
+        """
+        Returns units left in today's budget, less reserved units
+
+        :return: units
+        :rtype: int
+        """
+        with self._lock:
+            self._reset_if_new_day()
+            return self.daily_budget - self._used - self._reserved
+
+    def can_afford(self, units: int) -> bool:
+        return self.remaining() >= units
+
+    def reserve(self, units: int) -> Reservation:
+        """
+        Sets aside units for a fetch, so it is rejected up front instead of
+        failing halfway. Only requests given the reservation use its units,
+        others use what is left of the budget.
+
+        :params:
+            units (int): estimated cost of the fetch
+        :return: reservation, pass to acquire() and release()
+        :rtype: Reservation
+        :raises QuotaExceededError: if the units do not fit in the budget
+        """
+        with self._lock:
+            self._reset_if_new_day()
+            if self._used + self._reserved + units > self.daily_budget:
+                raise QuotaExceededError(
+                    f"{units} units requested, "
+                    f"{self.daily_budget - self._used - self._reserved} remain"
+                )
+            self._reserved += units
+            return Reservation(units, self._day)
+
+    def release(self, reservation: Reservation) -> None:
+        """Returns units of a reservation that were not used"""
+        with self._lock:
+            self._reset_if_new_day()
+            self._reserved = max(self._reserved - self._held(reservation), 0)
+            reservation.units = 0
+
+    def acquire(
+        self,
+        endpoint: str,
+        block: bool = True,
+        reservation: Optional[Reservation] = None,
+    ) -> None:
+        """
+        Records a request to an endpoint, waiting for the rate limit
+
+        :params:
+            endpoint (str): 'channels', 'playlistItems', 'videos' etc.
+            block (bool): wait for the rate limit instead of raising
+            reservation (Reservation, optional): units of the fetch the
+                request belongs to, used before the budget
+        :raises QuotaExceededError: if the request does not fit in the budget,
+            or the rate limit is reached and block is False
+        """
+        units = self.costs.get(endpoint, 1)
+        while True:
+            with self._lock:
+                self._reset_if_new_day()
+                now = time.monotonic()
+                self._tokens = min(
+                    self._tokens + (now - self._refilled_at) * self.rate,
+                    self.burst,
+                )
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    from_reserved = min(units, self._held(reservation))
+                    if self._used + units - from_reserved > (
+                        self.daily_budget - self._reserved
+                    ):
+                        raise QuotaExceededError(
+                            f"daily budget of {self.daily_budget} units used"
+                        )
+                    self._tokens -= 1
+                    if reservation is not None:
+                        reservation.units -= from_reserved
+                    self._reserved -= from_reserved
+                    self._used += units
+                    return
+                if not block:
+                    raise QuotaExceededError("rate limit reached")
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
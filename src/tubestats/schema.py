@@ -0,0 +1,151 @@
+#!usr/bin/env python3
+# tubestats/schema.py - columns and datatypes of the video dataframes
+#
+# by Shivan Sivakumaran
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# columns of videos().list responses used for statistics, everything else
+# (thumbnails, tags, localizations etc.) is dropped when fetched
+VIDEO_COLUMNS = [
+    "snippet.publishedAt",
+    "snippet.title",
+    "id",
+    "snippet.description",
+    "contentDetails.duration",
+    "statistics.viewCount",
+    "statistics.likeCount",
+    "statistics.favoriteCount",
+    "statistics.commentCount",
+]
+
+# keys leading to each column within a video resource
+VIDEO_PATHS: Dict[str, Tuple[str, ...]] = {
+    column: tuple(column.split(".")) for column in VIDEO_COLUMNS
+}
+
+# fields requested from the API by each request, as dotted paths within the
+# response. Only these are returned, see
+# https://developers.google.com/youtube/v3/getting-started#fields
+REQUEST_FIELDS: Dict[str, List[str]] = {
+    "channel": [
+        "items.contentDetails.relatedPlaylists.uploads",
+        "items.snippet.title",
+        "items.snippet.description",
+        "items.snippet.publishedAt",
+        "items.snippet.thumbnails.high.url",
+        "items.statistics.subscriberCount",
+        "items.statistics.videoCount",
+    ],
+    "playlist": ["nextPageToken", "items.contentDetails.videoId"],
+    "videos": ["items." + column for column in VIDEO_COLUMNS],
+    "video_channel": ["items.id", "items.snippet.channelId"],
+    "username_channel": ["items.id"],
+}
+
+# datatypes of counts in the cleaned dataframe, views can pass 2**31
+COUNT_DTYPES = {
+    "statistics.viewCount": "int64",
+    "statistics.likeCount": "int32",
+    "statistics.favoriteCount": "int32",
+    "statistics.commentCount": "int32",
+}
+
+
+def prune_video_data(df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame:
+    """
+    Keeps the columns in VIDEO_COLUMNS, adding those missing from the
+    response e.g. likeCount when every video hides likes
+
+    :params:
+        df (pandas.core.frame.DataFrame): video data
+    :return: df
+    :rtype: pandas.core.frame.DataFrame
+    """
+    return df.reindex(columns=VIDEO_COLUMNS)
+
+
+def new_video_buffers() -> Dict[str, List]:
+    """
+    Creates empty buffers for extract_video_columns(), one per column
+
+    :return: buffers
+    :rtype: Dict[str, List]
+    """
+    return {column: [] for column in VIDEO_COLUMNS}
+
+
+def extract_video_columns(
+    items: List[Dict], buffers: Optional[Dict[str, List]] = None
+) -> Dict[str, List]:
+    """
+    Takes the fields in VIDEO_COLUMNS out of video resources, without
+    flattening the whole response. Missing fields are None.
+
+    :params:
+        items (list): 'items' of a videos().list response
+        buffers (dict, optional): columns to append to, new if not given
+    :return: buffers, a list of values per column
+    :rtype: Dict[str, List]
+    """
+    if buffers is None:
+        buffers = new_video_buffers()
+    for column, path in VIDEO_PATHS.items():
+        buffer = buffers[column]
+        for item in items:
+            value: Any = item
+            try:
+                for key in path:
+                    value = value[key]
+            except KeyError:
+                value = None
+            buffer.append(value)
+    return buffers
+
+
+def register_fields(request: str, *paths: str) -> None:
+    """
+    Adds fields to those requested, for new statistics. Fields of videos
+    are added to VIDEO_COLUMNS too, so they are kept in the video data.
+
+    :params:
+        request (str): key of REQUEST_FIELDS e.g. 'videos'
+        *paths (str): dotted paths within the response e.g.
+            'items.statistics.viewCount'
+    """
+    fields = REQUEST_FIELDS.setdefault(request, [])
+    fields.extend(path for path in paths if path not in fields)
+    if request != "videos":
+        return
+    for path in paths:
+        column = path[len("items.") :]
+        if path.startswith("items.") and column not in VIDEO_PATHS:
+            VIDEO_COLUMNS.append(column)
+            VIDEO_PATHS[column] = tuple(column.split("."))
+
+
+def request_fields(request: str) -> str:
+    """
+    Renders the fields of a request as the API's fields parameter
+    e.g. 'items(id,snippet(title)),nextPageToken'
+
+    :params:
+        request (str): key of REQUEST_FIELDS
+    :return: fields parameter
+    :rtype: str
+    """
+    tree: Dict = {}
+    for path in REQUEST_FIELDS[request]:
+        node = tree
+        for key in path.split("."):
+            node = node.setdefault(key, {})
+
+    def render(node: Dict) -> str:
+        return ",".join(
+            key + ("(" + render(child) + ")" if child else "")
+            for key, child in node.items()
+        )
+
+    return render(tree)
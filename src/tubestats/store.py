@@ -0,0 +1,229 @@
+#!usr/bin/env python3
+# tubestats/store.py - stores snapshots of channels as Parquet files
+#                    - a directory per channel with videos and channel metadata
+#                    - reads select columns and date ranges only
+#
+# by Shivan Sivakumaran
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+from tubestats.cadence import DEFAULT_WINDOW, Cadence
+from tubestats.data import YouTubeData
+
+PUBLISHED_AT = "snippet.publishedAt_REFORMATED"
+# key of the rolling window in the metadata of the cadence_rolling file
+WINDOW_KEY = b"tubestats.cadence_window"
+
+
+class SnapshotStore:
+    """
+    Stores the cleaned video dataframe and metadata of channels as compressed
+    Parquet, needs pyarrow
+
+    :params:
+        root (str or Path): directory holding the snapshots
+        compression (str): Parquet compression codec
+        row_group_size (int): videos per row group, date filters skip
+            row groups outside the range as videos are stored oldest first
+    :methods:
+        write(): stores snapshot of a channel
+        read_videos(): reads video dataframe
+        read_channel(): reads channel metadata
+        load(): reads snapshot as YouTubeData
+        channels(): IDs of channels stored
+        write_cadence(): stores upload cadence of a channel
+        read_cadence(): reads upload cadence
+        update_cadence(): adds new videos to the stored cadence
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        compression: str = "zstd",
+        row_group_size: int = 5000,
+    ):
+        self.root = Path(root)
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def _path(self, channel_ID: str, name: str) -> Path:
+        return self.root / channel_ID / f"{name}.parquet"
+
+    def write(self, youtuber_data: YouTubeData) -> Path:
+        """
+        Stores the cleaned video dataframe and metadata of a channel, only
+        the typed columns of the dataframe
+
+        :params:
+            youtuber_data (YouTubeData)
+        :return: directory of the snapshot
+        :rtype: Path
+        """
+        path = self.root / youtuber_data.channel_ID
+        path.mkdir(parents=True, exist_ok=True)
+        youtuber_data.dataframe().to_parquet(
+            self._path(youtuber_data.channel_ID, "videos"),
+            compression=self.compression,
+            index=False,
+            row_group_size=self.row_group_size,
+        )
+        pd.DataFrame([youtuber_data.channel_data]).to_parquet(
+            self._path(youtuber_data.channel_ID, "channel"),
+            compression=self.compression,
+            index=False,
+        )
+        return path
+
+    def read_videos(
+        self,
+        channel_ID: str,
+        columns: Optional[List[str]] = None,
+        published_after: Optional[datetime] = None,
+        published_before: Optional[datetime] = None,
+    ) -> pd.core.frame.DataFrame:
+        """
+        Reads the video dataframe of a channel
+
+        :params:
+            channel_ID (str)
+            columns (list, optional): columns to read, all if not given
+            published_after (datetime, optional): earliest upload included
+            published_before (datetime, optional): uploads before this only
+        :return: df
+        :rtype: pandas.core.frame.DataFrame
+        """
+        filters = []
+        if published_after is not None:
+            filters.append((PUBLISHED_AT, ">=", pd.Timestamp(published_after)))
+        if published_before is not None:
+            filters.append((PUBLISHED_AT, "<", pd.Timestamp(published_before)))
+        df = pd.read_parquet(
+            self._path(channel_ID, "videos"),
+            columns=columns,
+            filters=filters or None,
+        )
+        return df
+
+    def read_channel(self, channel_ID: str) -> Dict[str, str]:
+        """
+        Reads the metadata of a channel
+
+        :params:
+            channel_ID (str)
+        :return: channel metadata, see YouTubeAPI.get_channel_data()
+        :rtype: dict
+        """
+        channel_df = pd.read_parquet(self._path(channel_ID, "channel"))
+        return channel_df.iloc[0].to_dict()
+
+    def load(self, channel_ID: str) -> YouTubeData:
+        """
+        Reads the snapshot of a channel without calling the API, the stored
+        dataframe is used as is
+
+        :params:
+            channel_ID (str)
+        :return: youtuber_data
+        :rtype: YouTubeData
+        """
+        return YouTubeData(
+            channel_ID,
+            channel_data=self.read_channel(channel_ID),
+            df=self.read_videos(channel_ID),
+            cleaned=True,
+        )
+
+    def channels(self) -> List[str]:
+        """
+        Lists channels with a snapshot
+
+        :return: channel IDs
+        :rtype: List[str]
+        """
+        return sorted(
+            path.parent.name for path in self.root.glob("*/videos.parquet")
+        )
+
+    def write_cadence(self, channel_ID: str, cadence: Cadence) -> None:
+        """
+        Stores the upload cadence of a channel next to its snapshot
+
+        :params:
+            channel_ID (str)
+            cadence (Cadence)
+        """
+        (self.root / channel_ID).mkdir(parents=True, exist_ok=True)
+        for name, counts in (
+            ("week", cadence.weekly),
+            ("month", cadence.monthly),
+        ):
+            counts.rename_axis(name).reset_index().to_parquet(
+                self._path(channel_ID, f"cadence_{name}ly"),
+                compression=self.compression,
+                index=False,
+            )
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # the window is kept in the file's key-value metadata, DataFrame
+        # attrs are not stored by every pandas and pyarrow
+        table = pa.Table.from_pandas(cadence.rolling, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[WINDOW_KEY] = str(cadence.window).encode()
+        pq.write_table(
+            table.replace_schema_metadata(metadata),
+            self._path(channel_ID, "cadence_rolling"),
+            compression=self.compression,
+        )
+
+    def read_cadence(self, channel_ID: str) -> Optional[Cadence]:
+        """
+        Reads the upload cadence of a channel
+
+        :params:
+            channel_ID (str)
+        :return: cadence, None if not stored
+        :rtype: Optional[Cadence]
+        """
+        if not self._path(channel_ID, "cadence_rolling").exists():
+            return None
+        counts = [
+            pd.read_parquet(self._path(channel_ID, f"cadence_{name}ly"))
+            .set_index(name)["uploads"]
+            .rename_axis(None)
+            for name in ("week", "month")
+        ]
+        import pyarrow.parquet as pq
+
+        path = self._path(channel_ID, "cadence_rolling")
+        metadata = pq.read_schema(path).metadata or {}
+        window = int(metadata.get(WINDOW_KEY, DEFAULT_WINDOW))
+        rolling = pd.read_parquet(path)
+        return Cadence(counts[0], counts[1], rolling=rolling, window=window)
+
+    def update_cadence(self, youtuber_data: YouTubeData) -> Cadence:
+        """
+        Adds videos uploaded since the stored cadence was worked out, e.g.
+        after YouTubeData.refresh(), and stores it
+
+        :params:
+            youtuber_data (YouTubeData)
+        :return: cadence
+        :rtype: Cadence
+        """
+        df = youtuber_data.dataframe()
+        cadence = self.read_cadence(youtuber_data.channel_ID)
+        if cadence is None:
+            cadence = Cadence.from_dataframe(df)
+        else:
+            rolling = cadence.rolling
+            cadence.update(df)
+            if cadence.rolling is rolling:
+                # nothing new to store
+                return cadence
+        self.write_cadence(youtuber_data.channel_ID, cadence)
+        return cadence
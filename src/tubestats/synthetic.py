@@ -0,0 +1,160 @@
+#!usr/bin/env python3
+# tubestats/synthetic.py - generates synthetic YouTube channels
+#                        - video resources shaped like videos().list items
+#                        - realistic upload cadence with the odd hiatus
+#                        - heavy-tailed view counts
+#
+# by Shivan Sivakumaran
+
+import string
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tubestats.schema import extract_video_columns
+
+ID_ALPHABET = np.array(list(string.ascii_letters + string.digits + "-_"))
+
+
+def _ids(rng: np.random.Generator, n: int, length: int) -> List[str]:
+    chars = rng.choice(ID_ALPHABET, size=(n, length))
+    return ["".join(row) for row in chars]
+
+
+def _iso_duration(seconds: int) -> str:
+    hours, seconds = divmod(seconds, 60 * 60)
+    minutes, seconds = divmod(seconds, 60)
+    duration = "PT"
+    if hours:
+        duration += f"{hours}H"
+    if minutes:
+        duration += f"{minutes}M"
+    if seconds or duration == "PT":
+        duration += f"{seconds}S"
+    return duration
+
+
+def synthetic_videos(
+    n: int,
+    seed: int = 0,
+    start: datetime = datetime(2010, 1, 1),
+    mean_gap_days: Optional[float] = None,
+    hiatus_rate: float = 0.02,
+) -> List[Dict]:
+    """
+    Generates video resources, as in the items of a videos().list response
+
+    :params:
+        n (int): number of videos
+        seed (int): seed of the random generator
+        start (datetime): roughly when the first video is uploaded
+        mean_gap_days (float, optional): average days between uploads,
+            by default twice a week, more often for large channels so
+            uploads span no more than about 13 years
+        hiatus_rate (float): chance a gap is a hiatus, about 20 gaps long
+    :return: videos newest first, as in the uploads playlist
+    :rtype: List[dict]
+    """
+    if mean_gap_days is None:
+        mean_gap_days = min(3.5, 3500 / max(n, 1))
+    rng = np.random.default_rng(seed)
+    # gaps cluster around a schedule, with the odd long hiatus
+    gaps = rng.gamma(shape=2.0, scale=mean_gap_days / 2, size=n)
+    hiatus = rng.random(n) < hiatus_rate
+    gaps[hiatus] += rng.exponential(20 * mean_gap_days, size=hiatus.sum())
+    gaps[0] = 0
+    seconds = np.cumsum(gaps * 24 * 60 * 60).astype(np.int64)
+    published = [start + timedelta(seconds=int(s)) for s in seconds]
+
+    # views are heavy tailed, a few videos go viral
+    views = np.floor(rng.pareto(1.2, size=n) * 2000 + 100).astype(np.int64)
+    likes = np.floor(views * rng.uniform(0.01, 0.06, size=n)).astype(np.int64)
+    comments = np.floor(views * rng.uniform(0.001, 0.01, size=n)).astype(
+        np.int64
+    )
+    durations = np.clip(rng.lognormal(6.4, 0.7, size=n), 15, 6 * 60 * 60)
+
+    ids = _ids(rng, n, 11)
+    videos = [
+        {
+            "kind": "youtube#video",
+            "id": ids[i],
+            "snippet": {
+                "publishedAt": published[i].strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "title": f"Video {i + 1}",
+                "description": f"Description of video {i + 1}",
+            },
+            "contentDetails": {"duration": _iso_duration(int(durations[i]))},
+            "statistics": {
+                "viewCount": str(views[i]),
+                "likeCount": str(likes[i]),
+                "favoriteCount": "0",
+                "commentCount": str(comments[i]),
+            },
+        }
+        for i in range(n)
+    ]
+    videos.reverse()
+    return videos
+
+
+def synthetic_channel(
+    n: int, seed: int = 0, **kwargs
+) -> Tuple[Dict, List[Dict]]:
+    """
+    Generates a channel resource, as in a channels().list response, and its
+    videos
+
+    :params:
+        n (int): number of videos
+        seed (int): seed of the random generator
+        **kwargs: passed to synthetic_videos()
+    :return: channel resource and videos newest first
+    :rtype: Tuple[dict, List[dict]]
+    """
+    videos = synthetic_videos(n, seed=seed, **kwargs)
+    rng = np.random.default_rng(seed)
+    channel_ID = "UC" + _ids(rng, 1, 22)[0]
+    started = (
+        videos[-1]["snippet"]["publishedAt"]
+        if videos
+        else "2010-01-01T00:00:00Z"
+    )
+    channel = {
+        "kind": "youtube#channel",
+        "id": channel_ID,
+        "snippet": {
+            "title": f"Synthetic channel {seed}",
+            "description": f"Synthetic channel with {n} videos",
+            "publishedAt": started,
+            "thumbnails": {"high": {"url": "https://example.com/thumb.jpg"}},
+        },
+        "contentDetails": {
+            "relatedPlaylists": {"uploads": "UU" + channel_ID[2:]}
+        },
+        "statistics": {
+            "subscriberCount": str(n * 100),
+            "videoCount": str(n),
+        },
+    }
+    return channel, videos
+
+
+def synthetic_video_data(
+    n: int, seed: int = 0, **kwargs
+) -> pd.core.frame.DataFrame:
+    """
+    Generates video data as returned by YouTubeAPI.get_video_data()
+
+    :params:
+        n (int): number of videos
+        seed (int): seed of the random generator
+        **kwargs: passed to synthetic_videos()
+    :return: df
+    :rtype: pandas.core.frame.DataFrame
+    """
+    return pd.DataFrame(
+        extract_video_columns(synthetic_videos(n, seed=seed, **kwargs))
+    )
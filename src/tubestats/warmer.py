@@ -0,0 +1,286 @@
+#!usr/bin/env python3
+# tubestats/warmer.py - keeps popular channels in the response cache
+#                     - tracks how often each channel is requested
+#                     - refreshes the most popular on a schedule
+#                     - within a quota budget per round
+#
+# by Shivan Sivakumaran
+
+import argparse
+import heapq
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tubestats.api import YouTubeAPI
+from tubestats.cache import DEFAULT_TTLS, ResponseCache, SQLiteCache
+from tubestats.metrics import METRICS
+from tubestats.quota import QuotaScheduler, channel_cost
+
+# seconds for a request to count half as much towards popularity
+HALF_LIFE = 7 * 24 * 60 * 60
+# channels scoring less than this are forgotten
+MIN_SCORE = 0.01
+# seconds between rounds, less than the shortest TTL so warmed playlists
+# are refreshed before they expire
+WARM_INTERVAL = min(DEFAULT_TTLS.values()) * 3 // 4
+
+
+class RequestTracker:
+    """
+    Popularity of channels, requests counted with exponential decay so
+    recent requests count more. Stored in SQLite, so it survives restarts
+    and can be shared with a warmer in another process.
+
+    :params:
+        path (str): database file, ':memory:' for a non-persistent tracker
+        half_life (float): seconds for a request to count half as much
+    :methods:
+        record(): counts a request for a channel
+        popular(): most requested channels
+    """
+
+    def __init__(self, path: str = ":memory:", half_life: float = HALF_LIFE):
+        self.path = path
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS channel_requests ("
+                "user_input TEXT PRIMARY KEY, score REAL NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def _decay(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, user_input: str, now: Optional[float] = None) -> None:
+        """
+        Counts a request for a channel
+
+        :params:
+            user_input (str): channel ID or link, as passed to YouTubeAPI
+            now (float, optional): time of the request, defaults to now
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT score, updated_at FROM channel_requests "
+                "WHERE user_input = ?",
+                (user_input,),
+            ).fetchone()
+            score = 1.0
+            if row is not None:
+                previous, updated_at = row
+                score = self._decay(previous, updated_at, now) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO channel_requests VALUES (?, ?, ?)",
+                (user_input, score, now),
+            )
+
+    def popular(
+        self, n: int, now: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Most requested channels, forgetting those no longer requested
+
+        :params:
+            n (int): number of channels
+            now (float, optional): time scores are decayed to
+        :return: user inputs and their scores, most popular first
+        :rtype: List[Tuple[str, float]]
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT user_input, score, updated_at FROM channel_requests"
+            ).fetchall()
+            scores = [
+                (user_input, self._decay(score, updated_at, now))
+                for user_input, score, updated_at in rows
+            ]
+            forgotten = [(i,) for i, score in scores if score < MIN_SCORE]
+            self._conn.executemany(
+                "DELETE FROM channel_requests WHERE user_input = ?", forgotten
+            )
+        scores = [(i, score) for i, score in scores if score >= MIN_SCORE]
+        return heapq.nlargest(n, scores, key=lambda item: item[1])
+
+
+class CacheWarmer:
+    """
+    Refreshes the response cache for popular channels, so their first
+    visitor is served from the cache. Only responses that would expire
+    before the next round are requested again.
+
+    :params:
+        cache (ResponseCache): cache the app reads from
+        tracker (RequestTracker): popularity of channels
+        scheduler (QuotaScheduler, optional): quota shared with the app
+        top (int): popular channels warmed each round
+        budget (int): quota units a round may use
+        keep_quota (int): units of the daily budget left for visitors
+        interval (float): seconds between rounds
+        channels (iterable): channels warmed every round, e.g. the default
+    :methods:
+        candidates(): channels to warm, in order
+        warm_once(): runs a round
+        start(): runs rounds on a background thread
+        stop(): stops the background thread
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        tracker: RequestTracker,
+        scheduler: Optional[QuotaScheduler] = None,
+        top: int = 10,
+        budget: int = 1000,
+        keep_quota: int = 2000,
+        interval: float = WARM_INTERVAL,
+        channels: Iterable[str] = (),
+    ):
+        self.cache = cache
+        self.tracker = tracker
+        self.scheduler = (
+            scheduler if scheduler is not None else QuotaScheduler()
+        )
+        self.top = top
+        self.budget = budget
+        self.keep_quota = keep_quota
+        self.interval = interval
+        self.channels = list(channels)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def candidates(self) -> List[str]:
+        """
+        Channels to warm, those always warmed first then the most popular
+
+        :return: user inputs
+        :rtype: List[str]
+        """
+        popular = [i for i, _ in self.tracker.popular(self.top)]
+        return list(dict.fromkeys(self.channels + popular))
+
+    def warm_once(self) -> Dict[str, int]:
+        """
+        Refreshes candidates in order until the round's budget is spent.
+        A channel is skipped if its estimated cost would exceed the budget
+        or leave less than keep_quota for the day.
+
+        :return: quota units used, by channel warmed
+        :rtype: Dict[str, int]
+        """
+        warmed: Dict[str, int] = {}
+        spent = 0
+        with METRICS.stage("warm"):
+            for user_input in self.candidates():
+                if spent >= self.budget:
+                    break
+                youtube = None
+                try:
+                    youtube = YouTubeAPI(
+                        user_input,
+                        cache=self.cache,
+                        scheduler=self.scheduler,
+                        refresh_within=self.interval,
+                    )
+                    channel_data = youtube.get_channel_data()
+                    cost = channel_cost(
+                        int(channel_data["channel_video_count"])
+                    )
+                    if (
+                        spent + youtube.units_used + cost > self.budget
+                        or self.scheduler.remaining() - cost < self.keep_quota
+                    ):
+                        continue
+                    youtube.get_video_data()
+                    warmed[user_input] = youtube.units_used
+                    METRICS.inc("tubestats_channels_warmed_total")
+                except Exception:
+                    logging.error(
+                        f"Error on warming {user_input}", exc_info=True
+                    )
+                finally:
+                    if youtube is not None:
+                        spent += youtube.units_used
+        return warmed
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.warm_once()
+            except Exception:
+                logging.error("Error on warming cache", exc_info=True)
+            self._stopped.wait(self.interval)
+
+    def start(self) -> threading.Thread:
+        """
+        Runs a round now, then every interval, on a daemon thread
+
+        :return: thread
+        :rtype: threading.Thread
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the background thread after the current round"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Refresh the response cache for popular channels"
+    )
+    parser.add_argument(
+        "--cache",
+        default="tubestats_cache.sqlite3",
+        help="SQLite database of the cache and request counts",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=1000)
+    parser.add_argument("--keep-quota", type=int, default=2000)
+    parser.add_argument("--daily-quota", type=int, default=10000)
+    parser.add_argument("--interval", type=float, default=WARM_INTERVAL)
+    parser.add_argument(
+        "--channels", nargs="*", default=[], help="always warmed"
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="run a single round and exit"
+    )
+    args = parser.parse_args(argv)
+
+    warmer = CacheWarmer(
+        SQLiteCache(args.cache),
+        RequestTracker(args.cache),
+        scheduler=QuotaScheduler(daily_budget=args.daily_quota),
+        top=args.top,
+        budget=args.budget,
+        keep_quota=args.keep_quota,
+        interval=args.interval,
+        channels=args.channels,
+    )
+    while True:
+        warmed = warmer.warm_once()
+        json.dump(warmed, sys.stdout)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 """Fixture for testing."""
 
+import math
 import pickle
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +10,8 @@ import pytest
 
 from tubestats.data import YouTubeData
 
+BASE_DIR = Path(__file__).parent.parent
+
 
 @pytest.fixture
 def set_channel_ID_test_case() -> str:
@@ -31,22 +34,137 @@ def set_channel_ID_test_case() -> str:
     return channel_ID
 
 
-@pytest.fixture()
-def youtubedata():
-    """Give YouTube data."""
-    BASE_DIR = Path(__file__).parent.parent
-    channel_ID = set_channel_ID_test_case()
+@pytest.fixture(autouse=True)
+def empty_lookup_cache(monkeypatch):
+    """Give each test an empty cache of channel lookups."""
+    monkeypatch.setattr("tubestats.parser._LOOKUP_CACHE", None)
 
-    # uses saved data instead of calling the API
+
+@pytest.fixture()
+def saved_data():
+    """Give saved channel data and video data."""
     with open(BASE_DIR / "tests" / "data" / "channel_data.pkl", "rb") as p:
         channel_data = pickle.load(p)
 
     df = pd.read_pickle(BASE_DIR / "tests" / "data" / "video_data.pkl")
+    return channel_data, df
+
+
+@pytest.fixture()
+def youtubedata(set_channel_ID_test_case, saved_data):
+    """Give YouTube data."""
+    channel_ID = set_channel_ID_test_case
+
+    # uses saved data instead of calling the API
+    channel_data, df = saved_data
 
     yd = YouTubeData(channel_ID=channel_ID, channel_data=channel_data, df=df)
     return yd
 
 
+def _nest(row: dict) -> dict:
+    """Turn a flattened row back into a nested API item."""
+    item: dict = {}
+    for column, value in row.items():
+        if isinstance(value, float) and math.isnan(value):
+            continue
+        *parents, key = column.split(".")
+        node = item
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return item
+
+
+class FakeRequest:
+    """Stands in for googleapiclient.http.HttpRequest."""
+
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, http=None):
+        return self.response
+
+
+class FakeYouTube:
+    """Stands in for the YouTube API client, serving saved data.
+
+    Uploads are served newest first, 50 to a page, like the API.
+    Requests are counted by endpoint in `calls`.
+    """
+
+    def __init__(self, channel_ID, channel_data, df):
+        self.channel_ID = channel_ID
+        self.channel_data = channel_data
+        self.items = [_nest(row) for row in df.to_dict("records")]
+        self.calls = {"channels": 0, "playlistItems": 0, "videos": 0}
+
+    def _endpoint(self, name, handler):
+        fake = self
+
+        class Endpoint:
+            def list(self, **params):
+                fake.calls[name] += 1
+                return FakeRequest(handler(**params))
+
+        return Endpoint()
+
+    def channels(self):
+        return self._endpoint("channels", self._channels)
+
+    def playlistItems(self):
+        return self._endpoint("playlistItems", self._playlist_items)
+
+    def videos(self):
+        return self._endpoint("videos", self._videos)
+
+    def _channels(self, **params):
+        data = self.channel_data
+        item = {
+            "id": self.channel_ID,
+            "contentDetails": {
+                "relatedPlaylists": {"uploads": data["upload_playlist_ID"]}
+            },
+            "snippet": {
+                "title": data["channel_name"],
+                "publishedAt": data["channel_start_date"],
+                "description": data["channel_description"],
+                "thumbnails": {"high": {"url": data["channel_thumbnail_url"]}},
+            },
+            "statistics": {
+                "subscriberCount": data["channel_subscriber_count"],
+                "videoCount": str(len(self.items)),
+            },
+        }
+        return {"items": [item]}
+
+    def _playlist_items(self, pageToken=None, maxResults=50, **params):
+        start = int(pageToken or 0)
+        page = self.items[start : start + maxResults]
+        response = {
+            "items": [
+                {"contentDetails": {"videoId": item["id"]}} for item in page
+            ]
+        }
+        if start + maxResults < len(self.items):
+            response["nextPageToken"] = str(start + maxResults)
+        return response
+
+    def _videos(self, id, **params):
+        ids = id.split(",") if isinstance(id, str) else id
+        by_id = {item["id"]: item for item in self.items}
+        return {"items": [by_id[i] for i in ids if i in by_id]}
+
+
+@pytest.fixture()
+def fake_youtube(set_channel_ID_test_case, saved_data, monkeypatch):
+    """Give a fake YouTube API client used in place of create_api()."""
+    channel_data, df = saved_data
+    youtube = FakeYouTube(set_channel_ID_test_case, channel_data, df)
+    monkeypatch.setattr("tubestats.api.create_api", lambda: youtube)
+    return youtube
+
+
 @pytest.fixture()
 def with_dates(youtubedata):
     """Provide dates."""
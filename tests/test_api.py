@@ -7,6 +7,7 @@ import pandas
 import pytest
 
 from tubestats.api import YouTubeAPI, create_api
+from tubestats.schema import VIDEO_COLUMNS
 
 
 def test_create_api():
@@ -43,3 +44,42 @@ def test_get_video_data(youtubeapi):
     # saving video data to save API calls for later testing
     BASE_DIR = Path(__file__).parent.parent
     df.to_pickle(BASE_DIR / "tests" / "data" / "video_data.pkl")
+
+
+def test_incremental_video_data(fake_youtube, set_channel_ID_test_case):
+    """Ensure only new videos are requested when given previous data."""
+    yt = YouTubeAPI(set_channel_ID_test_case)
+    full_df = yt.get_video_data()
+    fake_youtube.calls.update(playlistItems=0, videos=0)
+
+    previous = full_df.iloc[3:].reset_index(drop=True)
+    df = yt.get_video_data(previous=previous)
+    assert list(df["id"]) == list(full_df["id"])
+    assert fake_youtube.calls["playlistItems"] == 1
+    assert fake_youtube.calls["videos"] == 1
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_video_data_workers(fake_youtube, set_channel_ID_test_case, workers):
+    """Ensure videos stay in playlist order when fetched on a thread pool."""
+    yt = YouTubeAPI(set_channel_ID_test_case, workers=workers)
+    df = yt.get_video_data()
+    assert list(df["id"]) == [item["id"] for item in fake_youtube.items]
+
+
+def test_iter_video_frames(fake_youtube, set_channel_ID_test_case):
+    """Ensure video data can be read a page at a time."""
+    yt = YouTubeAPI(set_channel_ID_test_case)
+    frames = list(yt.iter_video_frames())
+    assert [len(frame) for frame in frames[:-1]] == [50] * (len(frames) - 1)
+    df = pandas.concat(frames, ignore_index=True)
+    pandas.testing.assert_frame_equal(df, yt.get_video_data())
+    assert list(df.columns) == VIDEO_COLUMNS
+
+
+def test_raw_video_data(fake_youtube, set_channel_ID_test_case):
+    """Ensure every field is kept when asked for."""
+    yt = YouTubeAPI(set_channel_ID_test_case)
+    df = yt.get_video_data(raw=True)
+    assert "snippet.thumbnails.default.url" in df.columns
+    assert len(df) == len(fake_youtube.items)
@@ -0,0 +1,107 @@
+"""Test asynchronous YouTube API client."""
+import asyncio
+
+import pandas
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from tubestats import fake_server  # noqa: E402
+from tubestats.async_api import AsyncYouTubeAPI, fetch_channels  # noqa: E402
+from tubestats.cache import SQLiteCache  # noqa: E402
+from tubestats.quota import QuotaScheduler  # noqa: E402
+
+
+@pytest.fixture()
+def asyncyoutubeapi(fake_youtube, set_channel_ID_test_case, monkeypatch):
+    """Async client answering from the fake YouTube API."""
+
+    async def _call(self, endpoint, reservation=None, **params):
+        await asyncio.sleep(0)
+        return getattr(fake_youtube, endpoint)().list(**params).execute()
+
+    monkeypatch.setattr(AsyncYouTubeAPI, "_call", _call)
+    return AsyncYouTubeAPI(set_channel_ID_test_case)
+
+
+@pytest.fixture()
+def fake_api(monkeypatch):
+    """Serve synthetic channels and point the async client at them."""
+    api = fake_server.FakeYouTubeAPI(seed=0)
+    channel_IDs = api.add_synthetic(2, 120)
+    server = fake_server.serve(api)
+    monkeypatch.setenv("YT_API_BASE_URL", fake_server.base_url(server))
+    yield api, channel_IDs
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_channel_data(asyncyoutubeapi):
+    channel_data = asyncio.run(asyncyoutubeapi.get_channel_data())
+    assert isinstance(channel_data, dict)
+
+
+def test_get_video_data(asyncyoutubeapi, fake_youtube):
+    df = asyncio.run(asyncyoutubeapi.get_video_data())
+    assert isinstance(df, pandas.core.frame.DataFrame)
+    assert list(df["id"]) == [item["id"] for item in fake_youtube.items]
+
+
+def test_session_video_data(fake_api):
+    api, channel_IDs = fake_api
+
+    async def fetch():
+        async with AsyncYouTubeAPI(channel_IDs[0]) as yt:
+            return await yt.get_video_data()
+
+    df = asyncio.run(fetch())
+    uploads = api.channels[channel_IDs[0]]["contentDetails"][
+        "relatedPlaylists"
+    ]["uploads"]
+    assert list(df["id"]) == [video["id"] for video in api.playlists[uploads]]
+
+
+def test_fetch_channels(fake_api):
+    api, channel_IDs = fake_api
+    video_ID = next(iter(api.videos))
+    inputs = channel_IDs + ["https://youtu.be/" + video_ID]
+    results = asyncio.run(fetch_channels(inputs))
+    expected = channel_IDs + [api.videos[video_ID]["snippet"]["channelId"]]
+    assert [channel_data["channel_name"] for channel_data, _ in results] == [
+        api.channels[channel_ID]["snippet"]["title"] for channel_ID in expected
+    ]
+    assert [len(df) for _, df in results] == [120, 120, 120]
+    # channel data is requested once per channel
+    assert api.requests["channels"] == 3
+
+
+def test_fetch_channels_cancels_on_error(fake_api):
+    _, channel_IDs = fake_api
+
+    async def fetch():
+        with pytest.raises(IndexError):
+            await fetch_channels(channel_IDs + ["UC" + "0" * 22])
+        # no requests are left running on the closed session
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(fetch()) == set()
+
+
+def test_fetch_channels_metered(fake_api):
+    api, channel_IDs = fake_api
+    cache = SQLiteCache()
+    scheduler = QuotaScheduler(rate=1000, burst=1000)
+    asyncio.run(fetch_channels(channel_IDs, cache=cache, scheduler=scheduler))
+    requests = dict(api.requests)
+    assert scheduler.remaining() == (
+        scheduler.daily_budget - sum(requests.values())
+    )
+    results = asyncio.run(
+        fetch_channels(channel_IDs, cache=cache, scheduler=scheduler)
+    )
+    assert [len(df) for _, df in results] == [120, 120]
+    # answered from the cache, so no quota is used
+    assert api.requests == requests
+    assert scheduler.remaining() == (
+        scheduler.daily_budget - sum(requests.values())
+    )
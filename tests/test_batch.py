@@ -0,0 +1,55 @@
+"""Test batch analysis of channels."""
+import io
+import json
+
+from tubestats import fake_server
+from tubestats.batch import channel_summary, read_inputs, run
+
+
+def test_read_inputs():
+    lines = io.StringIO(
+        "# channels\nUCrbYXWUmeCy4GqArthu4hCw\n\n  khQomXNzhkE \n"
+    )
+    assert read_inputs(lines) == ["UCrbYXWUmeCy4GqArthu4hCw", "khQomXNzhkE"]
+
+
+def test_channel_summary(youtubedata, set_channel_ID_test_case):
+    summary = channel_summary(set_channel_ID_test_case, youtubedata)
+    assert json.loads(json.dumps(summary)) == summary
+    assert summary["total_views"] == youtubedata.total_channel_views()
+    assert set(summary["time_diff_quantiles"]) == {
+        "0.25",
+        "0.5",
+        "0.75",
+        "1.0",
+    }
+
+
+def test_run_empty():
+    output = io.StringIO()
+    assert run([], output, workers=1) == 0
+    assert output.getvalue() == ""
+
+
+def test_run_links(monkeypatch):
+    api = fake_server.FakeYouTubeAPI(seed=0)
+    channel_IDs = api.add_synthetic(4, 60)
+    server = fake_server.serve(api)
+    monkeypatch.setenv("YT_API_BASE_URL", fake_server.base_url(server))
+    # links to two videos of each channel
+    links = [
+        f"https://www.youtube.com/watch?v={video['id']}"
+        for uploads in api.playlists.values()
+        for video in uploads[:2]
+    ]
+    output = io.StringIO()
+    try:
+        failed = run(links, output, workers=4)
+    finally:
+        server.shutdown()
+        server.server_close()
+    summaries = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert failed == 0, summaries
+    assert sorted(s["channel_name"] for s in summaries) == sorted(
+        api.channels[c]["snippet"]["title"] for c in channel_IDs for _ in "ab"
+    )
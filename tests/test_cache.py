@@ -0,0 +1,101 @@
+"""Test persistent API response cache."""
+import time
+
+import pytest
+
+from tubestats.api import YouTubeAPI
+from tubestats.cache import ResponseCache, SQLiteCache, make_key
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    """Cache stored in a temporary file."""
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+
+
+def test_make_key():
+    assert make_key("videos", {"id": "a", "part": "b"}) == make_key(
+        "videos", {"part": "b", "id": "a"}
+    )
+
+
+def test_fetch_hit(cache):
+    calls = []
+    for _ in range(2):
+        value = cache.fetch(
+            "videos", {"id": "a"}, lambda: calls.append(1) or {"n": len(calls)}
+        )
+    assert value == {"n": 1}
+    assert len(calls) == 1
+
+
+def test_persists(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path).fetch("videos", {"id": "a"}, lambda: {"n": 1})
+    assert SQLiteCache(path).fetch(
+        "videos", {"id": "a"}, lambda: {"n": 2}
+    ) == {"n": 1}
+
+
+def test_ttl_expired(cache):
+    cache.ttls["videos"] = 0
+    cache.fetch("videos", {"id": "a"}, lambda: {"n": 1})
+    assert cache.fetch("videos", {"id": "a"}, lambda: {"n": 2}) == {"n": 2}
+
+
+def test_stale_while_revalidate(cache):
+    cache.ttls["videos"] = 0
+    cache.stale_ttl = 60
+    cache.fetch("videos", {"id": "a"}, lambda: {"n": 1})
+    assert cache.fetch("videos", {"id": "a"}, lambda: {"n": 2}) == {"n": 1}
+    for _ in range(100):
+        if cache.get(make_key("videos", {"id": "a"}))[0] == {"n": 2}:
+            break
+        time.sleep(0.01)
+    assert cache.get(make_key("videos", {"id": "a"}))[0] == {"n": 2}
+
+
+def test_refresh_within(cache):
+    cache.ttls["videos"] = 60
+    cache.stale_ttl = 60
+    cache.fetch("videos", {"id": "a"}, lambda: {"n": 1})
+    assert cache.fetch("videos", {"id": "a"}, lambda: {"n": 2}) == {"n": 1}
+    value = cache.fetch(
+        "videos", {"id": "a"}, lambda: {"n": 2}, refresh_within=60
+    )
+    assert value == {"n": 2}
+
+
+def test_lookup(cache):
+    assert cache.lookup("playlistItems", {"playlistId": "a"}) is None
+    cache.store("playlistItems", {"playlistId": "a"}, {"pages": [["b"]]})
+    value = cache.lookup("playlistItems", {"playlistId": "a"})
+    assert value == {"pages": [["b"]]}
+    expiring = cache.lookup(
+        "playlistItems", {"playlistId": "a"}, refresh_within=60 * 60
+    )
+    assert expiring is None
+
+
+def test_abstract():
+    with pytest.raises(TypeError):
+        ResponseCache()
+
+
+def test_lru_eviction(cache):
+    for key in "abc":
+        cache.set(key, {})
+        time.sleep(0.01)
+    cache.get("a")
+    cache.set("d", {})
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_youtubeapi_cached(fake_youtube, set_channel_ID_test_case, cache):
+    cache.max_entries = 100
+    for _ in range(2):
+        df = YouTubeAPI(set_channel_ID_test_case, cache=cache).get_video_data()
+    assert len(df) == len(fake_youtube.items)
+    assert fake_youtube.calls["videos"] == -(-len(fake_youtube.items) // 50)
@@ -0,0 +1,56 @@
+"""Test upload cadence."""
+import pandas
+import pytest
+
+from tubestats.cadence import Cadence
+from tubestats.data import YouTubeData
+from tubestats.synthetic import synthetic_video_data
+
+
+@pytest.fixture()
+def synthetic_dataframe():
+    """Give the dataframe of a synthetic channel, oldest first."""
+    yd = YouTubeData(
+        "synthetic", channel_data={}, df=synthetic_video_data(3000, seed=3)
+    )
+    return yd.dataframe()
+
+
+def assert_cadence_equal(cadence, expected):
+    pandas.testing.assert_series_equal(
+        cadence.weekly, expected.weekly, check_freq=False
+    )
+    pandas.testing.assert_series_equal(
+        cadence.monthly, expected.monthly, check_freq=False
+    )
+    pandas.testing.assert_frame_equal(cadence.rolling, expected.rolling)
+
+
+def test_from_dataframe(synthetic_dataframe):
+    cadence = Cadence.from_dataframe(synthetic_dataframe, window=5)
+    assert cadence.weekly.sum() == cadence.monthly.sum() == 3000
+    assert len(cadence.rolling) == 3000
+    # weeks without uploads are counted as zero
+    assert (cadence.weekly == 0).any()
+    assert cadence.weekly.index.is_monotonic_increasing
+    gaps = cadence.rolling["gap_days"].iloc[1:6]
+    assert cadence.rolling["median_gap_days"].iloc[5] == pytest.approx(
+        gaps.median()
+    )
+
+
+def test_update(synthetic_dataframe):
+    df = synthetic_dataframe
+    cadence = Cadence.from_dataframe(df.iloc[:2000])
+    for end in (2000, 2001, 2500, 3000):
+        cadence.update(df.iloc[:end])
+    assert_cadence_equal(cadence, Cadence.from_dataframe(df))
+    assert cadence.update(df) == 0
+
+
+def test_update_rebuilds(synthetic_dataframe):
+    df = synthetic_dataframe
+    cadence = Cadence.from_dataframe(df)
+    deleted = df.drop(df.index[10])
+    cadence.update(deleted)
+    assert_cadence_equal(cadence, Cadence.from_dataframe(deleted))
@@ -1,6 +1,10 @@
 """Testing for application."""
 
+import os
+import subprocess
+import sys
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import List
 
 import altair
@@ -8,6 +12,16 @@ import numpy
 import pandas
 import pytest
 
+from tubestats.data import (
+    YouTubeData,
+    downsample,
+    parse_durations,
+    parse_published_at,
+    top_k,
+)
+from tubestats.schema import VIDEO_COLUMNS, prune_video_data
+from tubestats.synthetic import synthetic_video_data
+
 
 def test_channel_name(youtubedata):
     name = youtubedata.channel_name()
@@ -71,6 +85,7 @@ def test_scatter_all_videos(with_dates, youtubedata):
     df = with_dates
     c = youtubedata.scatter_all_videos(df)
     assert isinstance(c, altair.vegalite.v4.api.Chart)
+    assert isinstance(c.to_dict(), dict)
 
 
 def test_most_viewed_videos(with_dates, youtubedata):
@@ -101,6 +116,7 @@ def test_time_difference_plot(time_difference, youtubedata):
     df = time_difference
     c = youtubedata.time_difference_plot(df)
     assert isinstance(c, altair.vegalite.v4.api.Chart)
+    assert isinstance(c.to_dict(), dict)
 
 
 def test_time_difference_statistics(time_difference, youtubedata):
@@ -110,8 +126,220 @@ def test_time_difference_statistics(time_difference, youtubedata):
 
 
 def test_greatest_time_difference_video(time_difference, youtubedata):
-    pass
-    # FIXME: test does not work but code remains functional
-    # df = time_difference
-    # vid_list = youtubedata.greatest_time_difference_video(df)
-    # assert isinstance(vid_list, dict)
+    df = time_difference
+    vid_list = youtubedata.greatest_time_difference_video(df)
+    assert isinstance(vid_list, dict)
+    greatest = list(df["id"]).index(vid_list["greatest"])
+    assert (
+        df["snippet.time_diff"].iloc[greatest] == df["snippet.time_diff"].max()
+    )
+    assert df["id"].iloc[greatest - 1] == vid_list["prev"]
+    assert df["id"].iloc[greatest + 1] == vid_list["_next"]
+
+
+def test_time_difference_calculate_days(youtubedata):
+    df = youtubedata.dataframe().iloc[[0, 2, 5]].reset_index(drop=True)
+    df_with_td = youtubedata.time_difference_calculate(df)
+    dates = df["snippet.publishedAt_REFORMATED"]
+    assert df_with_td["snippet.time_diff"].iloc[0] == 0
+    assert df_with_td["snippet.time_diff"].iloc[2] == pytest.approx(
+        (dates[2] - dates[1]).total_seconds() / (24 * 60 * 60)
+    )
+
+
+def test_dataframe_memoized(youtubedata, saved_data):
+    df = youtubedata.dataframe()
+    assert youtubedata.dataframe() is df
+    _, raw_df = saved_data
+    youtubedata._set_dataframe(raw_df.iloc[1:])
+    assert len(youtubedata.dataframe()) == len(df) - 1
+
+
+def test_parse_durations():
+    durations = pandas.Series(["PT1H2M3S", "P1DT1S", "P0D", "PT1.5S", 0])
+    parsed = parse_durations(durations)
+    assert parsed.dtype == "timedelta64[ns]"
+    assert list(parsed.dt.total_seconds()) == [3723, 86401, 0, 1.5, 0]
+
+
+def test_parse_published_at():
+    published_at = pandas.Series(["2021-10-09T15:00:17Z"])
+    parsed = parse_published_at(published_at)
+    assert parsed.dtype == "datetime64[ns]"
+    assert parsed[0] == datetime(2021, 10, 9, 15, 0, 17)
+
+
+def test_compact_dataframe(youtubedata):
+    # strings are parsed on assignment and not kept alongside
+    df = youtubedata.dataframe()
+    assert youtubedata.raw_dataframe() is df
+    assert "snippet.publishedAt" not in df
+    assert "contentDetails.duration" not in df
+    assert set(df.columns) - set(VIDEO_COLUMNS) == {
+        "snippet.publishedAt_REFORMATED",
+        "contentDetails.duration_REFORMATED",
+    }
+    assert df["statistics.likeCount"].dtype == "int32"
+    assert df["snippet.publishedAt_REFORMATED"].dtype == "datetime64[ns]"
+    assert df["contentDetails.duration_REFORMATED"].dtype == "timedelta64[ns]"
+
+
+def test_keep_raw(set_channel_ID_test_case, saved_data):
+    channel_data, df = saved_data
+    yd = YouTubeData(
+        set_channel_ID_test_case,
+        channel_data=channel_data,
+        df=df,
+        keep_raw=True,
+    )
+    raw_df = yd.raw_dataframe()
+    assert set(df.columns) <= set(raw_df.columns)
+    assert len(raw_df) == len(df)
+    # the response's strings are kept next to their parsed columns
+    for column in ["snippet.publishedAt", "contentDetails.duration"]:
+        assert raw_df[column].sort_index().equals(df[column].sort_index())
+        assert f"{column}_REFORMATED" in raw_df
+
+
+def test_df_not_assignable(youtubedata, saved_data):
+    _, df = saved_data
+    with pytest.raises(AttributeError):
+        youtubedata.df = df
+
+
+def test_no_videos(set_channel_ID_test_case, saved_data):
+    channel_data, _ = saved_data
+    yd = YouTubeData(
+        set_channel_ID_test_case,
+        channel_data=channel_data,
+        df=prune_video_data(pandas.DataFrame()),
+    )
+    df = yd.dataframe()
+    assert len(df) == 0
+    assert df["snippet.publishedAt_REFORMATED"].dtype == "datetime64[ns]"
+    assert yd.total_channel_views() == 0
+    assert yd.data_version() == (0, "NaT")
+    assert yd.total_watchtime() == timedelta(0)
+    assert (
+        len(yd.transform_dataframe(datetime(2000, 1, 1), datetime.now())) == 0
+    )
+    assert len(yd.top_videos()) == 0
+
+
+def test_missing_duration(youtubedata, saved_data):
+    _, df = saved_data
+    df = df.copy()
+    df.loc[df.index[0], "contentDetails.duration"] = None
+    youtubedata._set_dataframe(df)
+    durations = youtubedata.dataframe()["contentDetails.duration_REFORMATED"]
+    assert durations.loc[df.index[0]] == timedelta(0)
+
+
+@pytest.mark.parametrize(
+    "date_start, date_end",
+    [
+        (datetime(2017, 6, 30), datetime(2017, 12, 30)),
+        (datetime(2000, 1, 1), datetime(2030, 1, 1)),
+        (datetime(2030, 1, 1), datetime(2031, 1, 1)),
+        (datetime(2018, 1, 1), datetime(2017, 1, 1)),
+    ],
+)
+def test_transform_dataframe_range(youtubedata, date_start, date_end):
+    df = youtubedata.dataframe()
+    published = df["snippet.publishedAt_REFORMATED"]
+    expected = df[(published >= date_start) & (published < date_end)]
+    transformed_df = youtubedata.transform_dataframe(date_start, date_end)
+    assert list(transformed_df["id"]) == list(expected["id"])
+
+
+def test_transform_dataframe_bounds(youtubedata):
+    df = youtubedata.dataframe()
+    published = df["snippet.publishedAt_REFORMATED"]
+    date_start = published.iloc[3].to_pydatetime()
+    date_end = published.iloc[8].to_pydatetime()
+    transformed_df = youtubedata.transform_dataframe(date_start, date_end)
+    assert list(transformed_df["id"]) == list(df["id"].iloc[3:8])
+
+
+@pytest.mark.parametrize("num", [0, 1, 10, 100, 1000])
+def test_top_k(num):
+    rng = numpy.random.default_rng(0)
+    df = pandas.DataFrame(
+        {"views": rng.integers(0, 20, size=200), "id": numpy.arange(200)}
+    )
+    expected = df.sort_values("views", ascending=False, kind="stable")
+    top = top_k(df, "views", num, columns=["id"])
+    assert list(top.columns) == ["id"]
+    assert list(top["id"]) == list(expected["id"].head(num))
+
+
+def test_most_viewed_videos_ranked(with_dates, youtubedata):
+    most_viewed = youtubedata.most_viewed_videos(with_dates, num=5)
+    views = list(most_viewed["preserved_df"]["statistics.viewCount"])
+    assert views == sorted(with_dates["statistics.viewCount"])[::-1][:5]
+    assert most_viewed["title"] == list(
+        most_viewed["preserved_df"]["snippet.title"]
+    )
+
+
+def test_top_videos(youtubedata):
+    date_start, date_end = datetime(2017, 6, 30), datetime(2017, 12, 30)
+    for num in (3, 10):
+        top = youtubedata.top_videos(
+            num=num, date_start=date_start, date_end=date_end
+        )
+        window_df = youtubedata.transform_dataframe(date_start, date_end)
+        expected = top_k(window_df, "statistics.viewCount", num)
+        assert list(top["id"]) == list(expected["id"])
+    assert list(youtubedata.top_videos(num=3)["id"]) == list(
+        top_k(youtubedata.dataframe(), "statistics.viewCount", 3)["id"]
+    )
+
+
+@pytest.fixture()
+def synthetic_youtubedata():
+    """Give YouTube data of a large synthetic channel."""
+    return YouTubeData(
+        "synthetic", channel_data={}, df=synthetic_video_data(20000)
+    )
+
+
+def test_downsample(synthetic_youtubedata):
+    df = synthetic_youtubedata.dataframe()
+    columns = ("snippet.publishedAt_REFORMATED", "statistics.viewCount")
+    sampled = downsample(df, *columns, max_rows=1000)
+    assert 0 < len(sampled) <= 1000
+    assert sampled["snippet.publishedAt_REFORMATED"].is_monotonic_increasing
+    assert df["statistics.viewCount"].idxmax() in sampled.index
+    assert len(downsample(df.head(100), *columns, max_rows=1000)) == 100
+
+
+def test_chart_payload(synthetic_youtubedata):
+    yd = synthetic_youtubedata
+    time_df = yd.time_difference_calculate(yd.dataframe())
+    for chart in (
+        yd.scatter_all_videos(time_df, max_rows=500),
+        yd.time_difference_plot(time_df, max_rows=500),
+    ):
+        spec = chart.to_dict()
+        (values,) = spec["datasets"].values()
+        assert len(values) <= 500
+        assert "snippet.description" not in values[0]
+        assert "transform" not in spec
+
+
+def test_headless_import():
+    code = (
+        "import sys, tubestats.batch, tubestats.store, tubestats.warmer; "
+        "print(sorted({'altair', 'isodate', 'sentry_sdk', 'streamlit'} "
+        "& set(sys.modules)))"
+    )
+    src = Path(__file__).parent.parent / "src"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=str(src)),
+    )
+    assert out.stdout.strip() == "[]"
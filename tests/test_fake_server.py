@@ -0,0 +1,113 @@
+"""Test the local stand-in YouTube API."""
+import googleapiclient.errors
+import pytest
+
+from tubestats import fake_server
+from tubestats.api import YouTubeAPI
+from tubestats.cache import SQLiteCache
+from tubestats.data import YouTubeData
+from tubestats.synthetic import synthetic_channel
+
+
+@pytest.fixture()
+def fake_api(monkeypatch):
+    """Serve a synthetic channel and point the API client at it."""
+    api = fake_server.FakeYouTubeAPI(seed=0)
+    channel_IDs = api.add_synthetic(1, 120)
+    server = fake_server.serve(api)
+    monkeypatch.setenv("YT_API_BASE_URL", fake_server.base_url(server))
+    yield api, channel_IDs[0]
+    server.shutdown()
+    server.server_close()
+
+
+def test_playlist_pages():
+    api = fake_server.FakeYouTubeAPI()
+    channel_ID = api.add_synthetic(1, 120)[0]
+    uploads = "UU" + channel_ID[2:]
+    tokens, video_IDs = [], []
+    page_token = None
+    while True:
+        query = {"playlistId": uploads, "maxResults": "50"}
+        if page_token is not None:
+            query["pageToken"] = page_token
+        status, response = api.handle("playlistItems", query)
+        assert status == 200
+        video_IDs += [
+            i["contentDetails"]["videoId"] for i in response["items"]
+        ]
+        page_token = response.get("nextPageToken")
+        if page_token is None:
+            break
+        tokens.append(page_token)
+    assert tokens == ["50", "100"]
+    assert len(set(video_IDs)) == 120
+
+
+def test_faults():
+    api = fake_server.FakeYouTubeAPI(server_error_rate=1.0)
+    status, response = api.handle("channels", {"id": "x"})
+    assert status in (500, 503)
+    api = fake_server.FakeYouTubeAPI(quota=2)
+    statuses = [api.handle("channels", {"id": "x"})[0] for _ in range(3)]
+    assert statuses == [200, 200, 403]
+    assert api.errors == {403: 1}
+
+
+def test_get_video_data_fake_server(fake_api):
+    api, channel_ID = fake_api
+    yt = YouTubeAPI(channel_ID)
+    assert yt.get_channel_data()["channel_video_count"] == "120"
+    df = yt.get_video_data()
+    assert len(df) == 120
+    assert api.requests == {"channels": 2, "playlistItems": 3, "videos": 3}
+
+
+def test_resolve_username_fake_server(fake_api):
+    api, channel_ID = fake_api
+    yt = YouTubeAPI("https://www.youtube.com/user/synthetic0")
+    assert yt.channel_ID == channel_ID
+
+
+def test_quota_error_fake_server(fake_api):
+    api, channel_ID = fake_api
+    api.quota_error_rate = 1.0
+    yt = YouTubeAPI(channel_ID)
+    with pytest.raises(googleapiclient.errors.HttpError) as e:
+        yt.get_channel_data()
+    assert e.value.resp.status == 403
+
+
+def test_cached_playlist_new_uploads(fake_api):
+    api, channel_ID = fake_api
+    cache = SQLiteCache()
+    df = YouTubeAPI(channel_ID, cache=cache).get_video_data()
+    api.upload(channel_ID, synthetic_channel(3, seed=1)[1])
+
+    # evicting any pages after the first, which would be requested again
+    # shifted by the new uploads if pages were cached on their own
+    with cache._conn:
+        cache._conn.execute(
+            "DELETE FROM responses WHERE key LIKE ?",
+            ('playlistItems:%"pageToken": "%',),
+        )
+    df = YouTubeAPI(channel_ID, cache=cache).get_video_data()
+    assert df["id"].is_unique and len(df) == 120
+    cache.ttls["playlistItems"] = 0
+    df = YouTubeAPI(channel_ID, cache=cache).get_video_data()
+    assert df["id"].is_unique and len(df) == 123
+
+
+def test_refresh_with_cache(fake_api):
+    api, channel_ID = fake_api
+    # serving stale responses for a day, as the app does
+    cache = SQLiteCache(stale_ttl=24 * 60 * 60)
+    youtuber_data = YouTubeData(channel_ID, cache=cache)
+    version = youtuber_data.data_version()
+    api.upload(channel_ID, synthetic_channel(1, seed=1)[1])
+    assert youtuber_data.refresh() == 1
+    assert youtuber_data.video_count() == 121
+    assert youtuber_data.data_version() != version
+    version = youtuber_data.data_version()
+    assert youtuber_data.refresh() == 0
+    assert youtuber_data.data_version() == version
@@ -0,0 +1,72 @@
+"""Test instrumentation of stages and API calls."""
+import urllib.request
+
+import pytest
+
+from tubestats import api
+from tubestats.metrics import Metrics, serve
+
+
+def test_render_counters_and_stages():
+    """Ensure metrics are rendered in the Prometheus text format."""
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.inc("tubestats_api_calls_total", endpoint="videos")
+    metrics.inc("tubestats_api_calls_total", 2, endpoint="videos")
+    metrics.observe("tubestats_stage_seconds", 0.5, stage="dataframe")
+    text = metrics.render()
+    assert "# TYPE tubestats_api_calls_total counter" in text
+    assert 'tubestats_api_calls_total{endpoint="videos"} 3' in text
+    assert (
+        'tubestats_stage_seconds_bucket{stage="dataframe",le="0.1"} 0' in text
+    )
+    assert 'tubestats_stage_seconds_bucket{stage="dataframe",le="1"} 1' in text
+    assert 'tubestats_stage_seconds_count{stage="dataframe"} 1' in text
+
+
+def test_stage_records_on_error():
+    """Ensure a stage is timed even when it fails."""
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.stage("resolve_channel"):
+            raise ValueError
+    assert metrics.value("tubestats_stage_seconds", stage="resolve_channel")
+
+
+def test_write_and_serve(tmp_path):
+    """Ensure metrics are written to a file and served over HTTP."""
+    metrics = Metrics()
+    metrics.inc("tubestats_pages_total", 4)
+    path = tmp_path / "tubestats.prom"
+    metrics.write(str(path))
+    assert "tubestats_pages_total 4" in path.read_text()
+
+    server = serve(0, host="127.0.0.1", metrics=metrics)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as r:
+            assert "tubestats_pages_total 4" in r.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_api_metrics(fake_youtube, set_channel_ID_test_case):
+    """Ensure API calls, quota units, pages and rows are counted."""
+    api.METRICS.reset()
+    df = api.YouTubeAPI(set_channel_ID_test_case).get_video_data()
+    pages = fake_youtube.calls["playlistItems"]
+    assert api.METRICS.value("tubestats_pages_total") == pages
+    assert (
+        api.METRICS.value("tubestats_api_calls_total", endpoint="videos")
+        == fake_youtube.calls["videos"]
+    )
+    assert (
+        api.METRICS.value(
+            "tubestats_quota_units_total", endpoint="playlistItems"
+        )
+        == pages
+    )
+    assert api.METRICS.value(
+        "tubestats_rows_total", stage="fetch_videos"
+    ) == len(df)
+    assert api.METRICS.value("tubestats_stage_seconds", stage="fetch_videos")
@@ -5,8 +5,10 @@
 
 import pytest
 
-from tubestats.youtube_api import create_api
-from tubestats.youtube_parser import channel_parser
+from tubestats import fake_server
+from tubestats.api import create_api
+from tubestats.cache import SQLiteCache
+from tubestats.parser import ChannelResolver, channel_parser, parse_input
 
 
 @pytest.fixture()
@@ -33,3 +35,71 @@ def test_parser(youtubeapi):
     assert channel_parser(youtube, ALI_CHAN_ID) == ALI_CHAN_ID
     # assert channel_parser(youtube, ALI_CHAN_LEGACY_NAME) == ALI_CHAN_ID
     assert channel_parser(youtube, ALI_VIDEO_ID) == ALI_CHAN_ID
+
+
+@pytest.fixture()
+def fake_api():
+    api = fake_server.FakeYouTubeAPI()
+    channel_ID = api.add_synthetic(1, 120)[0]
+    server = fake_server.serve(api)
+    yield api, channel_ID, create_api(fake_server.base_url(server))
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_input():
+    assert parse_input("khQomXNzhkE") == ("video", "khQomXNzhkE")
+    assert parse_input("https://youtu.be/khQomXNzhkE") == (
+        "video",
+        "khQomXNzhkE",
+    )
+    assert parse_input("https://www.youtube.com/user/Sepharoth64") == (
+        "user",
+        "Sepharoth64",
+    )
+    with pytest.raises(ValueError):
+        parse_input("not a link")
+
+
+def test_resolve_many(fake_api):
+    api, channel_ID, youtube = fake_api
+    video_IDs = list(api.videos)
+    inputs = ["https://youtu.be/" + video_ID for video_ID in video_IDs]
+    inputs += [
+        channel_ID,
+        "https://www.youtube.com/user/synthetic0",
+        "https://youtu.be/aaaaaaaaaaa",
+        "not a link",
+    ]
+    resolver = ChannelResolver(youtube)
+    channel_IDs = resolver.resolve_many(inputs)
+    assert channel_IDs == [channel_ID] * 122 + [None, None]
+    # one request per 50 video IDs, and one per username
+    assert api.requests == {"videos": 3, "channels": 1}
+
+    assert resolver.resolve(video_IDs[0]) == channel_ID
+    assert api.requests == {"videos": 3, "channels": 1}
+    with pytest.raises(ValueError):
+        resolver.resolve("aaaaaaaaaaa")
+
+
+def test_resolve_persistent(fake_api, tmp_path):
+    api, channel_ID, youtube = fake_api
+    video_ID = next(iter(api.videos))
+    path = str(tmp_path / "cache.sqlite3")
+    assert channel_parser(youtube, video_ID, cache=SQLiteCache(path)) == (
+        channel_ID
+    )
+    assert channel_parser(youtube, video_ID, cache=SQLiteCache(path)) == (
+        channel_ID
+    )
+    assert api.requests == {"videos": 1}
+
+
+def test_resolve_shared(fake_api):
+    api, channel_ID, youtube = fake_api
+    video_ID = next(iter(api.videos))
+    # resolvers not given a cache share the lookups of the process
+    assert channel_parser(youtube, video_ID) == channel_ID
+    assert channel_parser(youtube, video_ID) == channel_ID
+    assert api.requests == {"videos": 1}
@@ -0,0 +1,84 @@
+"""Test the pool of HTTP clients shared between threads."""
+
+import threading
+
+import pytest
+
+from tubestats import fake_server
+from tubestats.api import YouTubeAPI, create_api
+from tubestats.pool import HttpPool
+
+
+class FakeHttp:
+    """Stands in for httplib2.Http."""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_reused():
+    pool = HttpPool(max_idle=1, factory=FakeHttp)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool.created == 1
+
+    # clients past max_idle are closed when returned
+    with pool.connection() as first, pool.connection() as second:
+        pass
+    assert pool.created == 2
+    assert len(pool) == 1
+    assert first.closed and not second.closed
+
+
+def test_connection_closed_on_error():
+    pool = HttpPool(factory=FakeHttp)
+    with pytest.raises(ValueError):
+        with pool.connection() as http:
+            raise ValueError
+    assert http.closed
+    assert len(pool) == 0
+
+
+def test_connection_per_thread():
+    pool = HttpPool(factory=FakeHttp)
+    barrier = threading.Barrier(4)
+    lent = []
+
+    def borrow():
+        with pool.connection() as http:
+            lent.append(http)
+            barrier.wait()
+
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, lent))) == 4
+    assert len(pool) == 4
+
+
+def test_shared_across_channels(monkeypatch):
+    api = fake_server.FakeYouTubeAPI(seed=0)
+    channel_IDs = api.add_synthetic(3, 200)
+    server = fake_server.serve(api)
+    url = fake_server.base_url(server)
+    monkeypatch.setenv("YT_API_BASE_URL", url)
+    pool = HttpPool()
+    try:
+        assert create_api() is create_api(url)
+        for channel_ID in channel_IDs:
+            df = YouTubeAPI(channel_ID, workers=2, pool=pool).get_video_data()
+            assert len(df) == 200
+        # the paging thread and two workers, whatever the channels
+        assert pool.created <= 3
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
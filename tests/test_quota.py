@@ -0,0 +1,86 @@
+"""Test quota scheduling of API requests."""
+from datetime import date
+
+import pytest
+
+from tubestats.api import YouTubeAPI
+from tubestats.quota import QuotaExceededError, QuotaScheduler, channel_cost
+
+
+def test_channel_cost():
+    assert channel_cost(0) == 2
+    assert channel_cost(50) == 2
+    assert channel_cost(409) == 18
+
+
+def test_acquire_budget():
+    scheduler = QuotaScheduler(daily_budget=101, rate=1000, burst=1000)
+    scheduler.acquire("search")
+    scheduler.acquire("videos")
+    assert scheduler.remaining() == 0
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("videos")
+
+
+def test_acquire_rate_limit():
+    scheduler = QuotaScheduler(rate=0.001, burst=1)
+    scheduler.acquire("videos", block=False)
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("videos", block=False)
+
+
+def test_reserve():
+    scheduler = QuotaScheduler(daily_budget=10, rate=1000, burst=1000)
+    reservation = scheduler.reserve(8)
+    with pytest.raises(QuotaExceededError):
+        scheduler.reserve(3)
+    # requests of the fetch use its reserved units first
+    scheduler.acquire("videos", reservation=reservation)
+    assert reservation.units == 7
+    assert scheduler.remaining() == 2
+    scheduler.release(reservation)
+    assert reservation.units == 0
+    assert scheduler.remaining() == 9
+
+
+def test_reserve_unrelated_requests():
+    scheduler = QuotaScheduler(daily_budget=10, rate=1000, burst=1000)
+    reservation = scheduler.reserve(8)
+    # other requests only use the units not reserved
+    scheduler.acquire("channels")
+    scheduler.acquire("channels")
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("channels")
+    for _ in range(8):
+        scheduler.acquire("videos", reservation=reservation)
+    assert scheduler.remaining() == 0
+
+
+def test_reserve_new_day(monkeypatch):
+    scheduler = QuotaScheduler(daily_budget=10, rate=1000, burst=1000)
+    reservation = scheduler.reserve(8)
+    monkeypatch.setattr(scheduler, "_quota_day", lambda: date(2100, 1, 1))
+    # reservations lapse with the day, their requests use the new budget
+    scheduler.acquire("videos", reservation=reservation)
+    assert scheduler.remaining() == 9
+    scheduler.release(reservation)
+    assert scheduler.remaining() == 9
+    scheduler.reserve(9)
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("videos")
+
+
+def test_youtubeapi_quota(fake_youtube, set_channel_ID_test_case):
+    scheduler = QuotaScheduler(rate=1000, burst=1000)
+    yt = YouTubeAPI(set_channel_ID_test_case, scheduler=scheduler)
+    yt.get_video_data()
+    assert yt.units_used == sum(fake_youtube.calls.values())
+    assert scheduler.remaining() == scheduler.daily_budget - yt.units_used
+
+
+def test_youtubeapi_rejected(fake_youtube, set_channel_ID_test_case):
+    scheduler = QuotaScheduler(daily_budget=5, rate=1000, burst=1000)
+    yt = YouTubeAPI(set_channel_ID_test_case, scheduler=scheduler)
+    with pytest.raises(QuotaExceededError):
+        yt.get_video_data()
+    assert fake_youtube.calls["playlistItems"] == 0
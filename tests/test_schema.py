@@ -0,0 +1,39 @@
+"""Test columns and fields of video data."""
+import pandas as pd
+
+from tubestats import schema
+
+
+def test_request_fields():
+    assert (
+        schema.request_fields("playlist")
+        == "nextPageToken,items(contentDetails(videoId))"
+    )
+
+
+def test_register_fields(monkeypatch):
+    monkeypatch.setitem(schema.REQUEST_FIELDS, "videos", ["items.id"])
+    monkeypatch.setattr(schema, "VIDEO_COLUMNS", ["id"])
+    monkeypatch.setattr(schema, "VIDEO_PATHS", {"id": ("id",)})
+    schema.register_fields("videos", "items.snippet.tags", "items.id")
+    assert schema.request_fields("videos") == "items(id,snippet(tags))"
+    assert schema.VIDEO_COLUMNS == ["id", "snippet.tags"]
+
+    # registered fields reach the video data
+    items = [{"id": "a", "snippet": {"tags": ["x"]}}, {"id": "b"}]
+    buffers = schema.extract_video_columns(items)
+    assert buffers["snippet.tags"] == [["x"], None]
+    df = schema.prune_video_data(pd.DataFrame(buffers))
+    assert list(df.columns) == ["id", "snippet.tags"]
+
+
+def test_extract_video_columns():
+    items = [
+        {"id": "a", "statistics": {"viewCount": "1"}},
+        {"id": "b", "snippet": {"title": "B"}},
+    ]
+    buffers = schema.extract_video_columns(items)
+    assert set(buffers) == set(schema.VIDEO_COLUMNS)
+    assert buffers["id"] == ["a", "b"]
+    assert buffers["statistics.viewCount"] == ["1", None]
+    assert buffers["snippet.title"] == [None, "B"]
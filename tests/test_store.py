@@ -0,0 +1,75 @@
+"""Test Parquet snapshot store."""
+from datetime import datetime
+
+import pandas
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from tubestats.cadence import DEFAULT_WINDOW, Cadence  # noqa: E402
+from tubestats.store import SnapshotStore  # noqa: E402
+
+
+@pytest.fixture()
+def store(tmp_path, youtubedata):
+    """Store holding a snapshot of the test channel."""
+    store = SnapshotStore(tmp_path)
+    store.write(youtubedata)
+    return store
+
+
+def test_channels(store, youtubedata):
+    assert store.channels() == [youtubedata.channel_ID]
+
+
+def test_read_videos(store, youtubedata):
+    df = store.read_videos(youtubedata.channel_ID)
+    pandas.testing.assert_frame_equal(
+        df, youtubedata.dataframe().reset_index(drop=True)
+    )
+
+
+def test_read_videos_filtered(store, youtubedata, with_dates):
+    df = store.read_videos(
+        youtubedata.channel_ID,
+        columns=["id", "statistics.viewCount"],
+        published_after=datetime(2017, 6, 30),
+        published_before=datetime(2017, 12, 30),
+    )
+    assert list(df.columns) == ["id", "statistics.viewCount"]
+    assert list(df["id"]) == list(with_dates["id"])
+
+
+def test_load(store, youtubedata):
+    loaded = store.load(youtubedata.channel_ID)
+    assert loaded.channel_data == youtubedata.channel_data
+    assert loaded.total_channel_views() == youtubedata.total_channel_views()
+    assert loaded.total_watchtime() == youtubedata.total_watchtime()
+    # the stored dataframe is used without cleaning it again
+    pandas.testing.assert_frame_equal(
+        loaded.dataframe(), store.read_videos(youtubedata.channel_ID)
+    )
+
+
+def test_update_cadence(store, youtubedata):
+    channel_ID = youtubedata.channel_ID
+    assert store.read_cadence(channel_ID) is None
+    cadence = store.update_cadence(youtubedata)
+    stored = store.read_cadence(channel_ID)
+    assert stored.window == cadence.window
+    pandas.testing.assert_series_equal(
+        stored.weekly, cadence.weekly, check_freq=False
+    )
+    pandas.testing.assert_frame_equal(stored.rolling, cadence.rolling)
+
+
+def test_cadence_window(store, youtubedata):
+    channel_ID = youtubedata.channel_ID
+    cadence = Cadence.from_dataframe(youtubedata.dataframe(), window=5)
+    store.write_cadence(channel_ID, cadence)
+    assert store.read_cadence(channel_ID).window == 5
+    # files without the window are read with the default
+    cadence.rolling.to_parquet(
+        store._path(channel_ID, "cadence_rolling"), index=False
+    )
+    assert store.read_cadence(channel_ID).window == DEFAULT_WINDOW
@@ -0,0 +1,41 @@
+"""Test generating synthetic channels."""
+import pandas as pd
+
+from tubestats import synthetic
+from tubestats.api import parse_channel_response
+from tubestats.data import YouTubeData
+
+
+def test_synthetic_videos():
+    videos = synthetic.synthetic_videos(500, seed=1)
+    assert len(videos) == 500
+    assert all(len(video["id"]) == 11 for video in videos)
+    published = [video["snippet"]["publishedAt"] for video in videos]
+    assert published == sorted(published, reverse=True)
+    assert synthetic.synthetic_videos(500, seed=1) == videos
+
+
+def test_synthetic_views_heavy_tailed():
+    df = synthetic.synthetic_video_data(10000)
+    views = df["statistics.viewCount"].astype("int64")
+    assert views.max() > 100 * views.median()
+
+
+def test_synthetic_large_channel():
+    df = synthetic.synthetic_video_data(100000)
+    published = pd.to_datetime(df["snippet.publishedAt"])
+    assert published.max().year < 2030
+
+
+def test_synthetic_channel_youtubedata():
+    channel, videos = synthetic.synthetic_channel(200)
+    channel_data = parse_channel_response({"items": [channel]})
+    assert channel_data["channel_video_count"] == "200"
+    youtuber_data = YouTubeData(
+        channel["id"],
+        channel_data=channel_data,
+        df=synthetic.synthetic_video_data(200),
+    )
+    df = youtuber_data.dataframe()
+    assert len(df) == 200
+    assert youtuber_data.total_watchtime().total_seconds() > 0
@@ -0,0 +1,69 @@
+"""Test warming the response cache for popular channels."""
+import pytest
+
+from tubestats import fake_server
+from tubestats.api import YouTubeAPI
+from tubestats.cache import SQLiteCache
+from tubestats.quota import QuotaScheduler
+from tubestats.warmer import HALF_LIFE, CacheWarmer, RequestTracker
+
+
+@pytest.fixture()
+def fake_api(monkeypatch):
+    """Serve synthetic channels and point the API client at them."""
+    api = fake_server.FakeYouTubeAPI(seed=0)
+    channel_IDs = api.add_synthetic(3, 120)
+    server = fake_server.serve(api)
+    monkeypatch.setenv("YT_API_BASE_URL", fake_server.base_url(server))
+    yield api, channel_IDs
+    server.shutdown()
+    server.server_close()
+
+
+def test_tracker_popular(tmp_path):
+    tracker = RequestTracker(str(tmp_path / "cache.sqlite3"))
+    for _ in range(2):
+        tracker.record("a", now=0)
+    tracker.record("b", now=0)
+    tracker.record("b", now=HALF_LIFE)
+    popular = tracker.popular(2, now=HALF_LIFE)
+    assert [i for i, _ in popular] == ["b", "a"]
+    assert [score for _, score in popular] == pytest.approx([1.5, 1.0])
+    # requests long ago are forgotten
+    assert tracker.popular(2, now=HALF_LIFE * 20) == []
+    assert RequestTracker(tracker.path).popular(2) == []
+
+
+def test_warm_once(fake_api):
+    api, channel_IDs = fake_api
+    cache = SQLiteCache()
+    tracker = RequestTracker()
+    tracker.record(channel_IDs[1])
+    warmer = CacheWarmer(cache, tracker, channels=[channel_IDs[0]])
+    assert warmer.candidates() == channel_IDs[:2]
+    warmed = warmer.warm_once()
+    assert list(warmed) == channel_IDs[:2]
+    assert all(units > 0 for units in warmed.values())
+
+    # visitors and the next round are served from the cache
+    requests = dict(api.requests)
+    df = YouTubeAPI(channel_IDs[1], cache=cache).get_video_data()
+    assert len(df) == 120
+    assert warmer.warm_once() == {c: 0 for c in channel_IDs[:2]}
+    assert api.requests == requests
+
+
+def test_warm_within_budget(fake_api):
+    api, channel_IDs = fake_api
+    tracker = RequestTracker()
+    for channel_ID in channel_IDs:
+        tracker.record(channel_ID)
+    # a channel of 120 videos costs 6 units after its channel request
+    warmer = CacheWarmer(SQLiteCache(), tracker, budget=10, keep_quota=0)
+    assert len(warmer.warm_once()) == 1
+    scheduler = QuotaScheduler(daily_budget=20)
+    warmer = CacheWarmer(
+        SQLiteCache(), tracker, scheduler=scheduler, keep_quota=15
+    )
+    assert warmer.warm_once() == {}
+    assert scheduler.remaining() >= 15